@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import tempfile
+import time
+import numpy as np
+
+from src.core.store import SQLiteStore
+from src.core.vectors import VectorIndex
+from src.core.ann import IVFIndex
+
+
+def make_entries(n, dim, n_clusters, spread, seed):
+    # Küme merkezleri gürültüye göre yakın: kümeler iç içe geçer, n_probe düştükçe recall da düşer
+    rng = np.random.default_rng(seed)
+    centers = spread * rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    vectors = centers[labels] + rng.standard_normal((n, dim)).astype(np.float32)
+    start_ts = 1_700_000_000
+    for i in range(n):
+        yield f"entry_{i}", {
+            "text": f"synthetic {i}",
+            "metadata": {"timestamp": start_ts + 60 * i, "timestamp_str": ""},
+            "embedding": vectors[i],
+        }
+
+
+def p95(values):
+    return float(np.percentile(values, 95)) * 1000
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="ahtabyte_ann_")
+    store = SQLiteStore(os.path.join(work_dir, "activity.db"), os.path.join(work_dir, "embeddings.f32"))
+
+    t0 = time.perf_counter()
+    entries = list(make_entries(args.n, args.dim, args.clusters, args.spread, args.seed))
+    for i in range(0, len(entries), 10000):
+        store.put_many(entries[i:i + 10000])
+    print(f"Loaded {args.n} x {args.dim} vectors in {time.perf_counter() - t0:.1f}s ({work_dir})")
+
+    exact = VectorIndex(store)
+    exact.refresh()
+    ann = IVFIndex(os.path.join(work_dir, "embeddings.ivf.npz"), n_lists=args.lists)
+    t0 = time.perf_counter()
+    approx = VectorIndex(store, ann=ann, ann_min_rows=args.min_rows)
+    approx.refresh()
+    print(f"Trained IVF ({args.lists} lists) in {time.perf_counter() - t0:.1f}s")
+
+    rng = np.random.default_rng(args.seed + 1)
+    queries = [entries[i][1]["embedding"] + 0.3 * rng.standard_normal(args.dim) for i in rng.integers(0, args.n, args.queries)]
+    first_ts = entries[0][1]["metadata"]["timestamp"]
+    last_ts = entries[-1][1]["metadata"]["timestamp"]
+    ranges = {
+        "all": (None, None),
+        "last 10%": (last_ts - (last_ts - first_ts) // 10, last_ts),
+    }
+
+    for range_name, (start_ts, end_ts) in ranges.items():
+        exact_hits, exact_times = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            exact_hits.append({entry_id for entry_id, _ in exact.search(q, start_ts, end_ts, args.k)})
+            exact_times.append(time.perf_counter() - t0)
+        print(f"\n[{range_name}] exact: p95 {p95(exact_times):.2f} ms")
+
+        for n_probe in args.probes:
+            ann.n_probe = n_probe
+            recalls, times = [], []
+            for q, truth in zip(queries, exact_hits):
+                t0 = time.perf_counter()
+                hits = {entry_id for entry_id, _ in approx.search(q, start_ts, end_ts, args.k)}
+                times.append(time.perf_counter() - t0)
+                recalls.append(len(hits & truth) / max(1, len(truth)))
+            print(f"[{range_name}] n_probe={n_probe:<4} recall@{args.k} {np.mean(recalls):.3f}  p95 {p95(times):.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF recall/latency against exact retrieve")
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=0.5, help="cluster center scale relative to per-vector noise")
+    parser.add_argument("--lists", type=int, default=256)
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--min-rows", type=int, default=20000, help="ranges with fewer rows skip IVF (AHTABYTE_ANN_MIN_ROWS)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import base64
+import io
+import tempfile
+import time
+from PIL import Image
+
+from src.core.visscollect import ScreenCapture, SyntheticSource
+from src.core.visioncache import dhash
+
+
+def legacy_capture(source, save_dir, i):
+    # Eski yol: 1280x720 kaydet, analizde tekrar aç, küçült ve yeniden kodla
+    img = source()
+    img = img.resize((1280, 720))
+    img_path = os.path.join(save_dir, f"legacy_{i}.jpg")
+    img.save(img_path, quality=30)
+
+    img = Image.open(img_path)
+    dhash(img)
+    img.thumbnail((1024, 768))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=70)
+    return base64.b64encode(buffer.getvalue())
+
+
+def new_capture(capture):
+    frame = capture.capture()
+    if frame is None:
+        return None
+    dhash(frame["image"])
+    return base64.b64encode(frame["jpeg"])
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="ahtabyte_capture_")
+    size = (args.width, args.height)
+
+    source = SyntheticSource(size, change_every=args.change_every, seed=args.seed)
+    t0 = time.perf_counter()
+    for i in range(args.n):
+        legacy_capture(source, work_dir, i)
+    legacy = (time.perf_counter() - t0) / args.n
+
+    source = SyntheticSource(size, change_every=args.change_every, seed=args.seed)
+    capture = ScreenCapture(source, save_dir=work_dir)
+    t0 = time.perf_counter()
+    for _ in range(args.n):
+        new_capture(capture)
+    new = (time.perf_counter() - t0) / args.n
+
+    print(f"{args.n} frames at {args.width}x{args.height}, screen changes every {args.change_every} frames")
+    print(f"legacy: {legacy * 1000:.1f} ms/frame")
+    print(f"new:    {new * 1000:.1f} ms/frame ({capture.captured} encoded, {capture.skipped} skipped)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Screen capture path benchmark with a synthetic frame source")
+    parser.add_argument("--n", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--change-every", type=int, default=3, help="0 = screen never changes")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import time
+
+from src.core.embedders import make_embedder
+
+APPS = ["main.py - Visual Studio Code", "Docs - Google Chrome", "Slack", "Figma", "Terminal", "Spotify"]
+
+
+def sample_texts(n):
+    # repeater'ın ürettiği kayıtlara benzer metinler
+    return [
+        f"TIME: 2026-03-01 10:{i % 60:02d}:00\n"
+        f"ACTIVE_WINDOWS: {[APPS[i % len(APPS)], APPS[(i * 7) % len(APPS)]]}\n"
+        f"KEY_COUNT: {i * 13 % 300}\nMOUSE_COUNT: {i * 5 % 80}\n"
+        f"SCREEN ANALYSIS: The user is editing code in {APPS[i % len(APPS)]} while reading documentation."
+        for i in range(n)
+    ]
+
+
+def run(args):
+    texts = sample_texts(args.n)
+    for name in args.embedders:
+        embedder = make_embedder(name)
+        embedder.batch_size = args.batch
+        t0 = time.perf_counter()
+        try:
+            embedder.warm_up()
+        except ImportError as e:
+            print(f"{name}: skipped ({e})")
+            continue
+        warm_up = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        vectors = embedder.embed(texts)
+        elapsed = time.perf_counter() - t0
+        print(f"{name:8} warm-up {warm_up * 1000:7.1f} ms  {len(texts) / elapsed:8.0f} texts/s  "
+              f"{elapsed / len(texts) * 1000:.2f} ms/text  dim {len(vectors[0])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the local embedding providers")
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--embedders", nargs="+", default=["hashing", "onnx"])
+    run(parser.parse_args())
@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Giriş noktası: (bütçe ms, import edilmemesi gereken paketler)
+ENTRY_POINTS = {
+    "src.core.store": (250, ["openai", "PIL", "matplotlib", "reportlab", "flask"]),
+    "src.core.rag": (400, ["openai", "PIL", "matplotlib", "reportlab"]),
+    "src.core.pdf": (400, ["openai", "matplotlib", "reportlab"]),
+    "src.api.server": (600, ["openai", "PIL", "matplotlib", "reportlab", "PyQt6"]),
+    "src.streaming.repeater": (800, ["openai", "matplotlib", "reportlab", "pynput", "pyautogui"]),
+    "recover": (400, ["openai", "PIL", "matplotlib", "reportlab"]),
+}
+
+
+def import_profile(module):
+    # -X importtime satırları: "import time: self | cumulative | modül" (girinti = iç içe import)
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    modules, total = [], 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        modules.append(name.strip())
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    error = result.stderr.strip().splitlines()[-1] if result.returncode != 0 else None
+    return total / 1000, modules, error
+
+
+def run(args):
+    failed = False
+    for module, (budget, forbidden) in ENTRY_POINTS.items():
+        if args.modules and module not in args.modules:
+            continue
+        # En iyi ölçüm: disk önbelleği ve .pyc ısınmış olsun
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        error = runs[-1][2]
+        if error is not None:
+            print(f"{module:24} skipped: {error}")
+            continue
+        elapsed = min(total for total, _, _ in runs)
+        loaded = set(runs[-1][1])
+        leaked = sorted(name for name in forbidden if name in loaded)
+        ok = elapsed <= budget * args.scale and not leaked
+        failed |= not ok
+        print(f"{module:24} {elapsed:7.1f} ms (budget {budget * args.scale:.0f})  "
+              f"{'ok' if ok else 'FAIL'}{'  loads ' + ', '.join(leaked) if leaked else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold import time of each entry point, checked against a budget")
+    parser.add_argument("modules", nargs="*", help="only these entry points")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply budgets (slow machines)")
+    run(parser.parse_args())
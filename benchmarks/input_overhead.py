@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import threading
+import time
+
+from src.core.tickcollect import Inputs
+
+
+class LockedInputs:
+    # Eski kayıt yolu: her olayda kilit alan iki sayaç
+    def __init__(self):
+        self.keysn = 0
+        self.clickn = 0
+        self.lock = threading.Lock()
+
+    def keyspress(self, key):
+        with self.lock:
+            self.keysn += 1
+
+    def clickpress(self, x, y, button, pressed):
+        if pressed:
+            with self.lock:
+                self.clickn += 1
+
+
+def per_event_ns(callback, args_list):
+    t0 = time.perf_counter_ns()
+    for args in args_list:
+        callback(*args)
+    return (time.perf_counter_ns() - t0) / len(args_list)
+
+
+def run(args):
+    n = args.n
+    keys = [("a",)] * n
+    clicks = [(10, 10, "left", i % 2 == 0) for i in range(n)]
+    moves = [(i % 1920, (i * 7) % 1080) for i in range(n)]
+    scrolls = [(0, 0, 0, 1)] * n
+
+    # Gerçek saat: olaylar birçok saniyeye yayılmaz, halka kutusu sıcak kalır; en kötü durum için sahte saat de ölçülür
+    fake_now = [0]
+
+    def spread_clock():
+        fake_now[0] += 1
+        return fake_now[0]
+
+    old = LockedInputs()
+    print(f"{n} synthetic events per callback")
+    print(f"locked counter  key   {per_event_ns(old.keyspress, keys):7.0f} ns/event")
+    print(f"locked counter  click {per_event_ns(old.clickpress, clicks):7.0f} ns/event")
+    for name, clock in (("ring", time.time), ("ring/new second", spread_clock)):
+        inputs = Inputs(clock=clock)
+        print(f"{name:15} key   {per_event_ns(inputs.keyspress, keys):7.0f} ns/event")
+        print(f"{name:15} click {per_event_ns(inputs.clickpress, clicks):7.0f} ns/event")
+        print(f"{name:15} move  {per_event_ns(inputs.move, moves):7.0f} ns/event")
+        print(f"{name:15} scroll{per_event_ns(inputs.scroll, scrolls):7.0f} ns/event")
+
+    inputs = Inputs()
+    for i in range(0, n, 3):
+        inputs.keyspress("a")
+    t0 = time.perf_counter()
+    for _ in range(100):
+        inputs.snapshot(600)
+    print(f"snapshot(600s) {(time.perf_counter() - t0) * 10:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-event CPU overhead of the input recorder")
+    parser.add_argument("--n", type=int, default=200000)
+    run(parser.parse_args())
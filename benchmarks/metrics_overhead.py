@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import time
+
+from src.core import metrics
+
+
+def per_call_ns(n, body):
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        body()
+    return (time.perf_counter_ns() - t0) / n
+
+
+def timed():
+    with metrics.timer("bench"):
+        pass
+
+
+def counted():
+    metrics.inc("ahtabyte_bench_total", stage="bench")
+
+
+def run(args):
+    baseline = per_call_ns(args.n, lambda: None)
+    for enabled in (False, True):
+        metrics.ENABLED = enabled
+        state = "enabled " if enabled else "disabled"
+        print(f"{state} timer {per_call_ns(args.n, timed) - baseline:7.0f} ns/call  "
+              f"counter {per_call_ns(args.n, counted) - baseline:7.0f} ns/call")
+    print(f"render: {len(metrics.render([({}, metrics.snapshot())]))} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call cost of the metrics layer, enabled and disabled")
+    parser.add_argument("--n", type=int, default=200000)
+    run(parser.parse_args())
@@ -0,0 +1,101 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import tempfile
+import time
+import numpy as np
+
+from src.core.vectors import EmbeddingMatrix, VectorIndex
+
+
+class FakeStore:
+    # VectorIndex'in kullandığı kadarı: satır listesi ve matris
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def vector_rows(self, after_seq=0):
+        n = len(self.vectors)
+        return [(i + 1, f"e{i}", i, i) for i in range(after_seq, n)]
+
+
+def clustered(n, dim, seed):
+    # Gerçek embedding'ler gibi kümelenmiş, birim uzunlukta vektörler; text-embedding-3'te olduğu gibi
+    # bilginin çoğu ilk boyutlarda (kısaltılabilir temsil)
+    rng = np.random.default_rng(seed)
+    weights = (1 / np.sqrt(1 + np.arange(dim) / 16)).astype(np.float32)
+    centers = rng.standard_normal((64, dim)).astype(np.float32)
+    x = centers[rng.integers(64, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    x *= weights
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def truncate(x, dim):
+    x = x[:, :dim]
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def build(tmp, name, vectors, dtype, scan):
+    matrix = EmbeddingMatrix(os.path.join(tmp, name), dtype=dtype, scan=scan)
+    for start in range(0, len(vectors), 10000):
+        matrix.append_many(vectors[start:start + 10000])
+    return matrix
+
+
+def measure(index, queries, truth, k):
+    hits, t0 = 0, time.perf_counter()
+    for query, expected in zip(queries, truth):
+        found = {int(entry_id[1:]) for entry_id, _ in index.search(query, n_results=k)}
+        hits += len(found & expected)
+    latency = (time.perf_counter() - t0) / len(queries) * 1000
+    return hits / (len(queries) * k), latency
+
+
+def run(args):
+    if args.vectors:
+        # Gerçek embedding matrisi (ör. data/embeddings.f32) üzerinde ölç
+        source, _ = EmbeddingMatrix(args.vectors).arrays()
+        base = np.asarray(source[:args.n], dtype=np.float32)
+    else:
+        base = clustered(args.n + args.queries, args.dim, args.seed)
+    base = base / np.linalg.norm(base, axis=1, keepdims=True)
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(len(base), size=args.queries, replace=False)
+    # Sorgu: var olan bir kaydın gürültülü hali
+    noise = rng.standard_normal((args.queries, base.shape[1])).astype(np.float32) * base.std(axis=0)
+    full_queries = base[query_rows] + 3 * noise
+
+    exact_top = np.argsort(-(full_queries @ base.T), axis=1)[:, :args.k]
+    truth = [set(map(int, row)) for row in exact_top]
+
+    print(f"{len(base)} vectors, {args.queries} queries, recall@{args.k} against full float32")
+    with tempfile.TemporaryDirectory() as tmp:
+        for dim in args.dims:
+            vectors = truncate(base, dim) if dim < base.shape[1] else base
+            queries = truncate(full_queries, dim) if dim < base.shape[1] else full_queries
+            variants = [
+                ("float32", "float32", "none", 0),
+                ("float16", "float16", "none", 0),
+                ("int8", "float16", "int8", 0),
+                ("int8+rerank", "float16", "int8", args.rerank),
+            ]
+            for name, dtype, scan, rerank in variants:
+                matrix = build(tmp, f"{dim}-{name}", vectors, dtype, scan)
+                index = VectorIndex(FakeStore(matrix), rerank_factor=rerank)
+                recall, latency = measure(index, queries, truth, args.k)
+                # int8 taramada okunan bayt int8 kopya, diskteki bayt float matris dahil
+                print(f"dim {dim:5} {name:12} recall {recall:.3f}  {latency:6.1f} ms/query  "
+                      f"{matrix.nbytes() / len(vectors):7.0f} bytes/entry on disk")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall and size of quantized / truncated embedding storage")
+    parser.add_argument("--n", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536, help="synthetic vector dimension")
+    parser.add_argument("--dims", type=int, nargs="+", default=[1536, 512, 256])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=4)
+    parser.add_argument("--vectors", default=None, help="path to an existing embeddings matrix")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
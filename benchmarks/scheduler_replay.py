@@ -0,0 +1,56 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+from collections import Counter
+import numpy as np
+
+from src.core.scheduler import replay
+
+STATES = {"busy": (3.0, 0.5), "active": (0.3, 0.2), "idle": (0.0, 0.0)}
+
+
+def make_trace(hours, seed, step=5):
+    # step saniyelik olaylar: durumlar arasında rastgele geçiş, her durumda farklı tuş/tık yoğunluğu
+    rng = np.random.default_rng(seed)
+    # Pencereler hep açık; kullanıcı aralarında alt-tab ile geçer, değişen sadece öndeki pencere
+    titles = [f"Window {i}" for i in range(6)]
+    events, state, focused = [], "active", 0
+    for t in range(0, hours * 3600, step):
+        if rng.random() < step / 600:
+            state = rng.choice(list(STATES), p=[0.3, 0.4, 0.3])
+        if state != "idle" and rng.random() < step / 240:
+            focused = int(rng.integers(len(titles)))
+        key_rate, click_rate = STATES[state]
+        keys = int(rng.poisson(key_rate * step))
+        clicks = int(rng.poisson(click_rate * step))
+        events.append((float(t), keys, clicks, titles, titles[focused]))
+    return events
+
+
+def summarize(name, decisions, hours):
+    reasons = Counter(d["reason"] for d in decisions if d["capture"])
+    states = Counter(d["state"] for d in decisions)
+    captures = sum(reasons.values())
+    print(f"{name}: {len(decisions)} ticks, {captures} captures ({captures / hours:.1f}/h), "
+          f"states {dict(states)}, capture reasons {dict(reasons)}")
+
+
+def run(args):
+    events = make_trace(args.hours, args.seed)
+    decisions = replay(events, vision_budget=args.budget)
+    # Aynı iz aynı kararları üretmeli
+    assert decisions == replay(events, vision_budget=args.budget)
+    summarize("adaptive", decisions, args.hours)
+    ticks = args.hours * 60
+    print(f"fixed:    {ticks} ticks, {ticks // 3} captures ({ticks // 3 / args.hours:.1f}/h)")
+    busiest = max(Counter(int(d["time"] // 3600) for d in decisions if d["capture"]).values(), default=0)
+    print(f"busiest hour: {busiest} captures (budget {args.budget})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a synthetic input trace through the sampling scheduler")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--budget", type=int, default=30, help="vision calls per hour")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
@@ -1,53 +1,129 @@
 import os
-import json
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from src.core.rag import RAGPipeline
-import time
+from src.core.store import get_store
+from src.core.ratelimit import TokenBucket, is_rate_limited, retry_after
+from src.core.screenshots import get_screenshots
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "data", "db.json")
-SS_DIR = os.path.join(BASE_DIR, "data", "screenshots")
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "data", "recover_checkpoint.json")
 
-pipeline = RAGPipeline()
 
-db = {}
-if os.path.exists(DB_PATH) and os.path.getsize(DB_PATH) > 0:
-    with open(DB_PATH, "r", encoding="utf-8") as f:
-        db = json.load(f)
+def load_checkpoint():
+    if not os.path.exists(CHECKPOINT_PATH):
+        return {"last_file": "", "failed": []}
+    with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-for filename in sorted(os.listdir(SS_DIR)):
-    if not filename.endswith(".jpg"):
-        continue
 
+def save_checkpoint(checkpoint):
+    tmp_path = CHECKPOINT_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def make_job(filename):
     name = filename.replace("screen_", "").replace(".jpg", "")
     dt = datetime.strptime(name, "%Y%m%d-%H%M%S")
     timestamp_str = dt.strftime("%Y-%m-%d %H:%M:%S")
-    timestamp = int(dt.timestamp())
-    entry_id = f"entry_{timestamp_str.replace(' ', '_').replace(':', '-')}"
+    return {
+        "filename": filename,
+        "timestamp": int(dt.timestamp()),
+        "timestamp_str": timestamp_str,
+        "entry_id": f"entry_{timestamp_str.replace(' ', '_').replace(':', '-')}",
+        "img_path": os.path.join("data", "screenshots", filename),
+    }
 
-    if entry_id in db:
-        continue
 
-    img_path = os.path.join("data", "screenshots", filename)
-    print(f"Analyzing: {timestamp_str}")
-    analysis = pipeline.analyze(img_path)
+def analyze_with_retry(pipeline, bucket, job, retries=5, backoff=2):
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            analysis = pipeline.analyze(job["img_path"])
+            bucket.recover()
+            return job, analysis, None
+        except Exception as e:
+            if attempt == retries:
+                return job, None, e
+            delay = backoff * 2 ** attempt
+            if is_rate_limited(e):
+                bucket.throttle()
+                delay = retry_after(e) or delay
+            time.sleep(delay)
 
-    time.sleep(2)
 
-    db[entry_id] = {
-        "text": f"TIME: {timestamp_str}\nSCREEN ANALYSIS: {analysis}",
-        "metadata": {
-            "timestamp": timestamp,
-            "timestamp_str": timestamp_str,
-            "screenshot_path": img_path
-        }
-    }
+def backfill(workers=4, rate=2.0, batch_size=20):
+    store = get_store()
+    pipeline = RAGPipeline(store)
+    checkpoint = load_checkpoint()
+
+    # Önce önceki çalışmada başarısız olanlar, sonra checkpoint'ten sonraki dosyalar (arşivdekiler dahil)
+    todo = checkpoint["failed"] + get_screenshots().names(after=checkpoint["last_file"])
+    jobs = [job for job in map(make_job, todo) if job["entry_id"] not in store]
+    # Bu arada kaydedilmiş olan eski hatalar listeden düşer
+    pending = {job["filename"] for job in jobs}
+    checkpoint["failed"] = [name for name in checkpoint["failed"] if name in pending]
+    total = len(jobs)
+    print(f"{total} screenshots to analyze ({workers} workers, {rate:.2f} req/s)")
+
+    bucket = TokenBucket(rate)
+    failed, batch, jobs_seen = [], [], []
+    new_failures, saved = [], set()
+    done = 0
+    started = time.time()
+
+    def commit():
+        pipeline.save_many(batch)
+        # Önceki hatalar ancak yeniden denemeleri kaydedilince çıkar; yarıda kesilen çalışma onları kaybetmez
+        previous = [name for name in checkpoint["failed"] if name not in saved]
+        checkpoint["failed"] = previous + [name for name in new_failures if name not in previous]
+        if jobs_seen:
+            checkpoint["last_file"] = max(checkpoint["last_file"], jobs_seen[-1])
+        save_checkpoint(checkpoint)
+        batch.clear()
+        new_failures.clear()
+        saved.clear()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda job: analyze_with_retry(pipeline, bucket, job), jobs)
+        for job, analysis, error in results:
+            jobs_seen.append(job["filename"])
+            done += 1
+            if error is not None:
+                print(f"Failed: {job['timestamp_str']}: {error}")
+                failed.append(job["filename"])
+                new_failures.append(job["filename"])
+            else:
+                saved.add(job["filename"])
+                batch.append((job["entry_id"], {
+                    "text": f"TIME: {job['timestamp_str']}\nSCREEN ANALYSIS: {analysis}",
+                    "metadata": {
+                        "timestamp": job["timestamp"],
+                        "timestamp_str": job["timestamp_str"],
+                        "screenshot_path": job["img_path"]
+                    }
+                }))
+
+            if len(batch) >= batch_size or done == total:
+                commit()
+                elapsed = time.time() - started
+                print(f"{done}/{total} analyzed, {done / elapsed:.2f} img/s, "
+                      f"rate limit {bucket.rate:.2f} req/s, {len(failed)} failed")
 
-    with open(DB_PATH, "w", encoding="utf-8") as f:
-        json.dump(db, f, ensure_ascii=False, indent=2)
+    print("Done.")
 
-    print(f"Added: {timestamp_str}")
 
-print("Done.")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill entries from saved screenshots")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=2.0, help="max vision requests per second")
+    parser.add_argument("--batch", type=int, default=20, help="entries per commit")
+    args = parser.parse_args()
+    backfill(args.workers, args.rate, args.batch)
@@ -1,33 +1,359 @@
+import sys
 import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import gzip
 import json
-from flask import Flask, jsonify, send_file
+import time
+import threading
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import Flask, Response, jsonify, request, send_file
+from src.core.store import get_store, parse_time, day_range
+from src.core.screenshots import get_screenshots
+from src.core import metrics
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DB_PATH = os.path.join(BASE_DIR, "data", "db.json")
+
+DATA_FIELDS = {"text", "metadata", "embedding"}
+DEFAULT_DATA_FIELDS = "text,metadata"
+GZIP_MIN_BYTES = 1024
+REPORT_WORKERS = 2
+REPORT_JOB_TTL = 3600  # biten işlerin durumu bu kadar saniye sorgulanabilir
+SYNC_FIELDS = DATA_FIELDS | {"screenshot"}
+SYNC_PAGE_SIZE = 200
+SYNC_MAX_PAGE_SIZE = 1000
+SYNC_MAX_WAIT = 30
+SYNC_POLL_INTERVAL = 1
+SYNC_HEARTBEAT = 15
 
 app = Flask(__name__)
 
+_report_pool = None
+_report_jobs = {}
+_jobs_by_date = {}
+_jobs_lock = threading.Lock()
+_pipeline = None
+
+
+def _gzip_response(response):
+    response.vary.add("Accept-Encoding")
+    if "gzip" in request.accept_encodings and len(response.data) >= GZIP_MIN_BYTES:
+        response.data = gzip.compress(response.data)
+        response.headers["Content-Encoding"] = "gzip"
+        # Sıkıştırılmış gövde farklı bir temsil; aynı güçlü ETag'i paylaşmamalı
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + "-gzip", weak)
+    return response
+
 
-def load_db():
-    if not os.path.exists(DB_PATH):
-        return {}
-    with open(DB_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+def _parse_fields(allowed):
+    fields = [f.strip() for f in request.args.get("fields", DEFAULT_DATA_FIELDS).split(",") if f.strip()]
+    unknown = set(fields) - allowed
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def load_db(start_ts=None, end_ts=None, fields=("text", "metadata")):
+    db = {}
+    entries = get_store().range(start_ts, end_ts, with_embedding="embedding" in fields)
+    for entry in entries:
+        entry_id = entry.pop("id")
+        db[entry_id] = {k: v for k, v in entry.items() if k in fields}
+    return db
 
 
 @app.route("/data", methods=["GET"])
 def get_data():
-    db = load_db()
-    return jsonify(db)
+    # ?from=2026-03-05&to=2026-03-06&fields=text,metadata,embedding
+    try:
+        start_ts = parse_time(request.args.get("from"))
+        end_ts = parse_time(request.args.get("to"), end_of_day=True)
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS"}), 400
+
+    try:
+        fields = _parse_fields(DATA_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Aralıktaki veri değişmediyse gövdeyi hiç üretmeden 304 dön
+    etag = get_store().fingerprint(start_ts, end_ts) + "-" + "-".join(sorted(fields))
+    for tag in (etag, etag + "-gzip"):
+        if request.if_none_match.contains(tag):
+            response = app.response_class(status=304)
+            response.set_etag(tag)
+            response.vary.add("Accept-Encoding")
+            return response
+
+    db = load_db(start_ts, end_ts, fields)
+    response = jsonify(db)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return _gzip_response(response)
+
+
+def _sync_entry(seq, entry, fields):
+    item = {"seq": seq, "id": entry["id"], "timestamp": entry["metadata"].get("timestamp")}
+    if "text" in fields:
+        item["text"] = entry["text"]
+    if "metadata" in fields:
+        item["metadata"] = {k: v for k, v in entry["metadata"].items() if k != "screenshot_path"}
+    if "screenshot" in fields:
+        item["screenshot_path"] = entry["metadata"].get("screenshot_path")
+    if "embedding" in fields and "embedding" in entry:
+        item["embedding"] = entry["embedding"]
+    return item
+
+
+def _parse_cursor(value):
+    cursor = int(value or 0)
+    if cursor < 0:
+        raise ValueError
+    return cursor
+
+
+@app.route("/sync", methods=["GET"])
+def sync():
+    # ?since=<cursor>&limit=200&fields=text,metadata,screenshot,embedding&wait=30
+    try:
+        since = _parse_cursor(request.args.get("since"))
+        limit = min(int(request.args.get("limit", SYNC_PAGE_SIZE)), SYNC_MAX_PAGE_SIZE)
+        wait = min(float(request.args.get("wait", 0)), SYNC_MAX_WAIT)
+    except ValueError:
+        return jsonify({"error": "since, limit and wait must be non-negative numbers"}), 400
+    if limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+    try:
+        fields = _parse_fields(SYNC_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    store = get_store()
+    changes = store.changes(since, limit + 1, with_embedding="embedding" in fields)
+    # Long-poll: yeni kayıt yoksa wait saniyeye kadar bekle
+    deadline = time.time() + wait
+    while not changes and time.time() < deadline:
+        time.sleep(min(SYNC_POLL_INTERVAL, max(deadline - time.time(), 0)))
+        changes = store.changes(since, limit + 1, with_embedding="embedding" in fields)
+
+    page = changes[:limit]
+    response = jsonify({
+        "entries": [_sync_entry(seq, entry, fields) for seq, entry in page],
+        "cursor": page[-1][0] if page else since,
+        "has_more": len(changes) > limit,
+    })
+    response.headers["Cache-Control"] = "no-store"
+    return _gzip_response(response)
+
+
+@app.route("/sync/stream", methods=["GET"])
+def sync_stream():
+    # Server-sent events; yeniden bağlanan istemci Last-Event-ID ile kaldığı yerden devam eder
+    try:
+        since = _parse_cursor(request.headers.get("Last-Event-ID") or request.args.get("since"))
+        fields = _parse_fields(SYNC_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e) or "since must be a non-negative integer"}), 400
+
+    store = get_store()
+
+    def events(cursor):
+        last_sent = time.time()
+        while True:
+            changes = store.changes(cursor, SYNC_PAGE_SIZE, with_embedding="embedding" in fields)
+            for seq, entry in changes:
+                data = json.dumps(_sync_entry(seq, entry, fields), ensure_ascii=False)
+                yield f"id: {seq}\nevent: entry\ndata: {data}\n\n"
+                cursor = seq
+            if changes:
+                last_sent = time.time()
+                continue
+            # Ara sunucular (ngrok) boşta kalan bağlantıyı kapatmasın
+            if time.time() - last_sent >= SYNC_HEARTBEAT:
+                yield ": keepalive\n\n"
+                last_sent = time.time()
+            time.sleep(SYNC_POLL_INTERVAL)
+
+    response = Response(events(since), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        # rag modülü OpenAI istemcisi kurar; sadece LLM uçları kullanıldığında yüklenir
+        from src.core.rag import RAGPipeline
+        _pipeline = RAGPipeline()
+        _pipeline.warm_up()
+    return _pipeline
+
+
+def _stream_response(tokens):
+    def events():
+        try:
+            for token in tokens:
+                yield f"data: {json.dumps({'delta': token}, ensure_ascii=False)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+
+    response = Response(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/query/stream", methods=["GET"])
+def query_stream():
+    # ?q=Figma'da ne yaptım&from=2026-03-05&to=2026-03-06
+    question = request.args.get("q", "").strip()
+    if not question:
+        return jsonify({"error": "q is required"}), 400
+    start, end = request.args.get("from"), request.args.get("to")
+    try:
+        parse_time(start)
+        parse_time(end)
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS"}), 400
+    return _stream_response(get_pipeline().query_stream(question, start, end))
+
+
+@app.route("/report/<date>/stream", methods=["GET"])
+def report_stream(date):
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+    return _stream_response(get_pipeline().generate_report_stream(f"{date} 00:00:00", f"{date} 23:59:59"))
+
+
+def _get_report_pool():
+    global _report_pool
+    if _report_pool is None:
+        # spawn: alt süreçler kendi SQLite bağlantısını açar
+        _report_pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _report_pool
+
+
+def _job_status(job):
+    future = job["future"]
+    status = {"job_id": job["id"], "date": job["date"], "status": "pending"}
+    if future.done():
+        error = future.exception()
+        if error is not None:
+            status.update(status="failed", error=str(error))
+        elif future.result() is None:
+            status.update(status="failed", error="No data for this date")
+        else:
+            status.update(status="done", url=f"/report/{job['date']}")
+    return status
+
+
+def _prune_report_jobs():
+    now = time.time()
+    for job_id, job in list(_report_jobs.items()):
+        if job.get("finished") is not None and now - job["finished"] > REPORT_JOB_TTL:
+            del _report_jobs[job_id]
+            if _jobs_by_date.get(job["date"]) is job:
+                del _jobs_by_date[job["date"]]
+
+
+def _start_report_job(date, force=False, fingerprint=None):
+    from src.core import pdf
+
+    with _jobs_lock:
+        _prune_report_jobs()
+        # Aynı tarih için süren bir iş varsa yenisini başlatma
+        job = _jobs_by_date.get(date)
+        if job is not None and not job["future"].done():
+            return job
+        job = {
+            "id": uuid.uuid4().hex,
+            "date": date,
+            "fingerprint": fingerprint,
+            "future": _get_report_pool().submit(pdf.generate_pdf, date, force),
+        }
+        job["future"].add_done_callback(lambda _: job.__setitem__("finished", time.time()))
+        _report_jobs[job["id"]] = job
+        _jobs_by_date[date] = job
+        return job
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    # Bu sürecin ölçümleri + repeater ve PDF işçilerinin son yazdığı anlık görüntüler
+    snapshots = [({"process": "server", "pid": os.getpid()}, metrics.snapshot())]
+    snapshots += metrics.process_snapshots(exclude_pid=os.getpid())
+    return Response(metrics.render(snapshots), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/screenshot/<name>", methods=["GET"])
+def get_screenshot(name):
+    # screenshot_path'in dosya adı; arşivlenmiş kareler de indeks üzerinden bulunur
+    if not (name.startswith("screen_") and name.endswith(".jpg")) or os.path.basename(name) != name:
+        return jsonify({"error": "Invalid screenshot name"}), 400
+    try:
+        data = get_screenshots().read(os.path.join("data", "screenshots", name))
+    except FileNotFoundError:
+        return jsonify({"error": "Screenshot not found"}), 404
+    response = app.response_class(data, mimetype="image/jpeg")
+    # Kare içeriği değişmez; sadece eskiyince küçültülebilir
+    response.headers["Cache-Control"] = "max-age=86400"
+    return response
 
 
 @app.route("/report/<date>", methods=["GET"])
 def get_report(date):
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD"}), 400
+
+    from src.core import pdf
+
     pdf_path = os.path.join(BASE_DIR, "data", f"report_{date}.pdf")
-    if not os.path.exists(pdf_path):
-        return jsonify({"error": "Report not found"}), 404
-    return send_file(pdf_path, mimetype="application/pdf")
+    job = _jobs_by_date.get(date)
+    if job is not None:
+        status = _job_status(job)
+        if status["status"] == "pending":
+            return jsonify(status), 202
+        if status["status"] == "failed" and not os.path.exists(pdf_path):
+            # Hata bir kez bildirilir; sonraki istek üretimi yeniden dener
+            _jobs_by_date.pop(date, None)
+            return jsonify(status), 404
+
+    # Günün verisi rapordan sonra değiştiyse (ör. bugün) yeniden üretilir. Aynı veriyle bitmiş bir iş varsa
+    # (AI analizi alınamadığı için önbellek kaydı yazılmamış olabilir) mevcut PDF sunulur, döngüye girilmez.
+    fingerprint = get_store().fingerprint(*day_range(date))
+    refresh = request.args.get("refresh") == "1"
+    stale = not pdf.is_report_fresh(pdf_path, fingerprint) and (job is None or job.get("fingerprint") != fingerprint)
+    if not os.path.exists(pdf_path) or refresh or stale:
+        # Boş gün için iş başlatılmaz; aksi halde her istek yeni bir üretim işi açar
+        if not get_store().range(*day_range(date), with_embedding=False, limit=1):
+            return jsonify({"error": "No data for this date"}), 404
+        job = _start_report_job(date, force=refresh, fingerprint=fingerprint)
+        response = jsonify(_job_status(job))
+        response.headers["Location"] = f"/report/jobs/{job['id']}"
+        return response, 202
+
+    # conditional: ETag / Last-Modified / Range desteği
+    return send_file(pdf_path, mimetype="application/pdf", conditional=True, etag=True)
+
+
+@app.route("/report/jobs/<job_id>", methods=["GET"])
+def get_report_job(job_id):
+    job = _report_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(_job_status(job))
 
 
 if __name__ == "__main__":
+    metrics.start_flusher("server")
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+
+CHUNK_ROWS = 8192
+SAVE_EVERY = 1000
+
+
+class IVFIndex:
+
+    def __init__(self, path, n_lists=256, n_probe=16, train_min=None, n_iter=10, retrain_factor=4, seed=0):
+        self.path = path
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_min = train_min or n_lists * 39
+        self.n_iter = n_iter
+        self.retrain_factor = retrain_factor
+        self.seed = seed
+        self.centroids = None
+        self.assign = np.empty(0, dtype=np.int32)
+        self.trained_rows = 0
+        self._saved_rows = 0
+        self._loaded = False
+
+    @property
+    def trained(self):
+        self._ensure_loaded()
+        return self.centroids is not None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if os.path.exists(self.path):
+            with np.load(self.path) as data:
+                self.centroids = data["centroids"]
+                self.assign = data["assign"]
+                self.trained_rows = int(data["trained_rows"])
+            self._saved_rows = len(self.assign)
+
+    def save(self):
+        if self.centroids is None:
+            return
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, assign=self.assign, trained_rows=self.trained_rows)
+        os.replace(tmp_path, self.path)
+        self._saved_rows = len(self.assign)
+
+    def _assign(self, vectors):
+        # Satır normu pozitif bir ölçek, argmax'i değiştirmez; normalize etmeye gerek yok
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for i in range(0, len(vectors), CHUNK_ROWS):
+            block = np.asarray(vectors[i:i + CHUNK_ROWS], dtype=np.float32)
+            labels[i:i + CHUNK_ROWS] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def train(self, matrix, norms):
+        n = len(matrix)
+        n_lists = min(self.n_lists, n)
+        rng = np.random.default_rng(self.seed)
+        sample = np.sort(rng.choice(n, size=min(n, n_lists * 64), replace=False))
+        x = np.asarray(matrix[sample], dtype=np.float32)
+        x_norms = np.asarray(norms[sample], dtype=np.float32)
+        x = x / np.where(x_norms > 0, x_norms, 1)[:, None]
+
+        # Küresel k-means: kosinüs benzerliği için merkezler de birim uzunlukta
+        centroids = x[rng.choice(len(x), size=n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            labels = np.argmax(x @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, x)
+            lengths = np.linalg.norm(sums, axis=1)
+            filled = lengths > 0
+            centroids[filled] = sums[filled] / lengths[filled, None]
+
+        self.centroids = centroids
+        self.assign = self._assign(matrix)
+        self.trained_rows = n
+        self.save()
+
+    def sync(self, matrix, norms):
+        self._ensure_loaded()
+        n = len(matrix)
+        if self.centroids is None:
+            if n >= self.train_min:
+                self.train(matrix, norms)
+            return
+        if n >= self.trained_rows * self.retrain_factor:
+            self.train(matrix, norms)
+            return
+        start = len(self.assign)
+        if start >= n:
+            return
+        self.assign = np.concatenate([self.assign, self._assign(matrix[start:n])])
+        if len(self.assign) - self._saved_rows >= SAVE_EVERY:
+            self.save()
+
+    def candidates(self, query, rows):
+        if not self.trained:
+            return None
+        n_probe = min(self.n_probe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+
+        # Henüz listeye atanmamış yeni satırlar her zaman aday kalır
+        mask = np.ones(len(rows), dtype=bool)
+        known = rows < len(self.assign)
+        mask[known] = np.isin(self.assign[rows[known]], probe)
+        return np.flatnonzero(mask)
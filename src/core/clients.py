@@ -0,0 +1,28 @@
+import os
+import threading
+from src.core import config
+
+_openai = None
+_openai_lock = threading.Lock()
+
+
+def get_openai():
+    global _openai
+    with _openai_lock:
+        if _openai is None:
+            # openai paketinin importu ~1 sn; sadece ilk LLM/embedding çağrısında yüklenir
+            from openai import OpenAI
+            _openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return _openai
+
+
+class LazyClient:
+    # İstemci gibi davranır, gerçek istemciyi ilk özellik erişiminde kurar
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+
+openai_client = LazyClient(get_openai)
@@ -0,0 +1,7 @@
+import os
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# AHTABYTE_* ayarları modüllerin import anında okunur; bu yüzden ayar okuyan her modül önce bunu import eder
+load_dotenv(os.path.join(BASE_DIR, ".env"))
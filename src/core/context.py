@@ -0,0 +1,81 @@
+import os
+from src.core import config
+from src.core.embedcache import normalize_text
+from src.core.rollup import estimate_tokens
+from src.core.store import parse_entry_text
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("AHTABYTE_CONTEXT_TOKENS", "6000"))
+RECENCY_WEIGHT = float(os.getenv("AHTABYTE_CONTEXT_RECENCY", "0.3"))
+SEPARATOR = "\n---\n"
+
+
+def is_empty(text):
+    # Tuş/tık yok ve ekran analizi yoksa kayıt bağlama bir şey katmaz
+    parsed = parse_entry_text(text)
+    return not parsed["key_count"] and not parsed["mouse_count"] and not parsed["analysis"]
+
+
+def _window_line(text):
+    for line in text.split("\n"):
+        if line.startswith("ACTIVE_WINDOWS:"):
+            return line
+    return None
+
+
+def pack_context(docs, metadatas=(), token_budget=CONTEXT_TOKEN_BUDGET, recency_weight=RECENCY_WEIGHT):
+    # docs alaka sırasıyla gelir; öncelik = alaka sırası ve yenilik karışımı
+    docs = list(docs)
+    metadatas = list(metadatas) or [{} for _ in docs]
+    if not docs:
+        return ""
+
+    candidates, seen = [], set()
+    for rank, (doc, metadata) in enumerate(zip(docs, metadatas)):
+        key = normalize_text(doc)
+        if not key or key in seen or (len(docs) > 1 and is_empty(doc)):
+            continue
+        seen.add(key)
+        candidates.append((rank, doc, metadata.get("timestamp", 0)))
+    if not candidates:
+        candidates = [(0, docs[0], metadatas[0].get("timestamp", 0))]
+
+    timestamps = [ts for _, _, ts in candidates]
+    oldest, newest = min(timestamps), max(timestamps)
+    span = newest - oldest or 1
+
+    def priority(candidate):
+        rank, _, ts = candidate
+        relevance = 1 - rank / len(docs)
+        recency = (ts - oldest) / span
+        return (1 - recency_weight) * relevance + recency_weight * recency
+
+    # Tekrarlanan pencere listeleri bir kez yazılır, kayıtlarda kısa etiketle anılır
+    repeats = {}
+    for _, doc, _ in candidates:
+        window_line = _window_line(doc)
+        repeats[window_line] = repeats.get(window_line, 0) + 1
+    legend, selected, used = {}, [], 0
+    for rank, doc, ts in sorted(candidates, key=priority, reverse=True):
+        window_line = _window_line(doc)
+        new_label = None
+        if window_line is not None and window_line not in legend and repeats[window_line] > 1:
+            new_label = f"W{len(legend) + 1}"
+        label = legend.get(window_line, new_label)
+        compact = doc.replace(window_line, f"ACTIVE_WINDOWS: [{label}]") if label else doc
+        cost = estimate_tokens(compact + SEPARATOR)
+        if new_label:
+            cost += estimate_tokens(f"{new_label} = {window_line[len('ACTIVE_WINDOWS:'):].strip()}\n")
+        if selected and used + cost > token_budget:
+            continue
+        if new_label:
+            legend[window_line] = new_label
+        selected.append((ts, rank, compact))
+        used += cost
+
+    blocks = [compact for _, _, compact in sorted(selected)]
+    if legend:
+        header = "WINDOW LISTS:\n" + "\n".join(
+            f"{label} = {line[len('ACTIVE_WINDOWS:'):].strip()}" for line, label in legend.items()
+        )
+        blocks.insert(0, header)
+    return SEPARATOR.join(blocks)
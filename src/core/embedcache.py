@@ -0,0 +1,93 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from array import array
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    key TEXT PRIMARY KEY,
+    embedding BLOB NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used);
+"""
+
+EVICT_EVERY = 100
+
+
+def normalize_text(text):
+    # TIME satırı her dakika değişir; geri kalanı aynıysa embedding de aynı kabul edilir
+    lines = [line for line in text.splitlines() if not line.startswith("TIME:")]
+    return re.sub(r"\s+", " ", "\n".join(lines)).strip()
+
+
+def cache_key(text, model):
+    return hashlib.sha1(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+
+    def __init__(self, path, max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" for _ in keys)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT key, embedding FROM embedding_cache WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            found = {}
+            for key, blob in rows:
+                values = array("f")
+                values.frombytes(blob)
+                found[key] = values.tolist()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                    [(time.time(), key) for key in found],
+                )
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items):
+        now = time.time()
+        rows = [(key, array("f", embedding).tobytes(), now) for key, embedding in items]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, embedding, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._puts += len(rows)
+            if self._puts >= EVICT_EVERY:
+                self._puts = 0
+                self.conn.execute(
+                    "DELETE FROM embedding_cache WHERE key NOT IN "
+                    "(SELECT key FROM embedding_cache ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+    def stats(self):
+        with self.lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": size,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,166 @@
+import os
+import re
+import zlib
+from functools import lru_cache
+import numpy as np
+from src.core import config
+from src.core.embedcache import normalize_text
+from src.core import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+EMBEDDER = os.getenv("AHTABYTE_EMBEDDER", "openai")  # openai | hashing | onnx
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIM = int(os.getenv("AHTABYTE_EMBEDDING_DIM", "512"))  # text-embedding-3 kısaltılmış çıktı
+EMBEDDING_THREADS = int(os.getenv("AHTABYTE_EMBEDDING_THREADS", "0"))  # 0 = tüm çekirdekler
+EMBEDDING_BATCH = int(os.getenv("AHTABYTE_EMBEDDING_BATCH", "64"))
+HASHING_DIM = 512
+ONNX_MODEL_DIR = os.getenv("AHTABYTE_ONNX_MODEL", os.path.join(BASE_DIR, "models", "all-MiniLM-L6-v2"))
+ONNX_MAX_TOKENS = 256
+
+
+def _normalize_rows(vectors):
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(lengths > 0, lengths, 1)
+
+
+class OpenAIEmbedder:
+    # Ağ üzerinden; sonuçlar pipeline'ın embedding önbelleğinde tutulur
+    remote = True
+    semantic = True
+
+    def __init__(self, client, model=EMBEDDING_MODEL, dim=EMBEDDING_DIM, batch_size=2048):
+        self.client = client
+        self.model = model
+        self.dim = dim
+        self.batch_size = batch_size
+        # Boyut koleksiyonun matrisinde sabittir, isme girmez (bkz. RAGPipeline)
+        self.name = f"openai:{model}"
+
+    @property
+    def cache_name(self):
+        return f"{self.model}:{self.dim}"
+
+    def embed(self, texts):
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=texts[start:start + self.batch_size],
+                dimensions=self.dim,
+            )
+            metrics.record_usage("embedding", self.model, getattr(response, "usage", None))
+            embeddings.extend(item.embedding for item in response.data)
+        return embeddings
+
+    def warm_up(self):
+        pass
+
+
+class HashingEmbedder:
+    # Ağ ve model dosyası gerektirmez: kelimeler ve kelime içi 3-gramlar işaretli hash ile sabit boyutlu vektöre düşer.
+    # Anlamsal benzerlik yerine ortak kelime/parça benzerliği yakalar; pencere başlıkları için çoğu zaman yeterli.
+    remote = False
+    semantic = False
+
+    def __init__(self, dim=HASHING_DIM, batch_size=EMBEDDING_BATCH):
+        self.dim = dim
+        self.batch_size = batch_size
+        self.name = f"hashing:{dim}"
+        self._features = lru_cache(maxsize=100000)(self._token_features)
+
+    def _token_features(self, token):
+        grams = [token] + [f"<{token}>"[i:i + 3] for i in range(len(token))]
+        hashes = np.asarray([zlib.crc32(gram.encode("utf-8")) for gram in grams], dtype=np.int64)
+        signs = np.where(hashes & (1 << 31), -1.0, 1.0)
+        # Kelimenin kendisi parçalarından daha ağır basar
+        signs[0] *= 2
+        return hashes % self.dim, signs
+
+    def embed(self, texts):
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            rows, indices, weights = [], [], []
+            for row, text in enumerate(batch):
+                for token in re.findall(r"\w+", normalize_text(text).lower()):
+                    index, sign = self._features(token)
+                    rows.append(np.full(len(index), row))
+                    indices.append(index)
+                    weights.append(sign)
+            vectors = np.zeros(len(batch) * self.dim)
+            if rows:
+                flat = np.concatenate(rows) * self.dim + np.concatenate(indices)
+                vectors = np.bincount(flat, weights=np.concatenate(weights), minlength=len(batch) * self.dim)
+            vectors = vectors.reshape(len(batch), self.dim)
+            # Sık tekrarlanan kelimeler vektörü domine etmesin
+            vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+            embeddings.extend(_normalize_rows(vectors).astype(np.float32).tolist())
+        return embeddings
+
+    def warm_up(self):
+        self.embed(["warm up"])
+
+
+class OnnxEmbedder:
+    # Yerel cümle kodlayıcı (ör. all-MiniLM-L6-v2): klasörde model.onnx ve tokenizer.json beklenir
+    remote = False
+    semantic = True
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, threads=EMBEDDING_THREADS, batch_size=EMBEDDING_BATCH):
+        self.model_dir = model_dir
+        self.threads = threads
+        self.batch_size = batch_size
+        self.name = f"onnx:{os.path.basename(os.path.normpath(model_dir))}"
+        self.dim = None
+        self._session = None
+        self._tokenizer = None
+
+    def _load(self):
+        if self._session is not None:
+            return
+        # onnxruntime ve tokenizers sadece bu sağlayıcı seçilirse gerekir
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(
+            os.path.join(self.model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {item.name for item in self._session.get_inputs()}
+        tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=ONNX_MAX_TOKENS)
+        tokenizer.enable_padding()
+        self._tokenizer = tokenizer
+
+    def embed(self, texts):
+        self._load()
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self._tokenizer.encode_batch(texts[start:start + self.batch_size])
+            ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+            mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+            feed = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self._inputs:
+                feed["token_type_ids"] = np.zeros_like(ids)
+            hidden = self._session.run(None, feed)[0]
+            # Dolgu token'ları hariç ortalama
+            pooled = (hidden * mask[:, :, None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+            embeddings.extend(_normalize_rows(pooled).astype(np.float32).tolist())
+        self.dim = len(embeddings[0]) if embeddings else self.dim
+        return embeddings
+
+    def warm_up(self):
+        # Oturum kurulumu ve ilk çalıştırma gecikmesi ilk kayda/soruya yansımasın
+        self.embed(["warm up"])
+
+
+def make_embedder(name=EMBEDDER, client=None):
+    if name == "openai":
+        return OpenAIEmbedder(client)
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "onnx":
+        return OnnxEmbedder()
+    raise ValueError(f"Unknown embedder: {name}")
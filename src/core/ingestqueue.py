@@ -0,0 +1,115 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from src.core import metrics
+
+
+class IngestWorker:
+
+    def __init__(self, pipeline, batch_size=8, max_delay=180, vision_workers=4, retries=3, backoff=2, poll_interval=5):
+        self.pipeline = pipeline
+        self.store = pipeline.store
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.retries = retries
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.pool = ThreadPoolExecutor(max_workers=vision_workers, thread_name_prefix="vision")
+        self._stop = threading.Event()
+        # Aynı süreçte yakalanan karelerin bellekteki hali; yeniden başlatmada diskten okunur
+        self.frames = {}
+        self.frames_lock = threading.Lock()
+
+    def add_frame(self, frame):
+        with self.frames_lock:
+            self.frames[frame["path"]] = frame
+
+    def _analyze(self, job):
+        if job["analysis"] is not None:
+            return job["analysis"]
+        if not job["img_path"]:
+            return "N/A"
+
+        with self.frames_lock:
+            frame = self.frames.pop(job["img_path"], None)
+        for attempt in range(self.retries + 1):
+            try:
+                with metrics.timer("analyze"):
+                    analysis = self.pipeline.analyze(job["img_path"], frame=frame)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"Screen analysis failed for {job['img_path']}: {e}")
+                    analysis = "N/A"
+                    break
+                time.sleep(self.backoff * 2 ** attempt)
+
+        # Embedding adımı başarısız olursa görüntü tekrar analiz edilmesin
+        self.store.set_analysis(job["entry_id"], analysis)
+        return analysis
+
+    def ready(self):
+        count, oldest = self.store.pending_stats()
+        metrics.set_gauge("ahtabyte_pending_entries", count)
+        if count == 0:
+            return False
+        return count >= self.batch_size or time.time() - oldest >= self.max_delay
+
+    def process_batch(self):
+        jobs = self.store.pending(self.batch_size)
+        if not jobs:
+            return 0
+
+        analyses = list(self.pool.map(self._analyze, jobs))
+        texts = [job["text"] + "\nSCREEN ANALYSIS: " + analysis for job, analysis in zip(jobs, analyses)]
+        entry_ids = [job["entry_id"] for job in jobs]
+
+        try:
+            with metrics.timer("embed"):
+                embeddings = self.pipeline.embed_many(texts)
+        except Exception as e:
+            print(f"Embedding batch failed, retrying later: {e}")
+            self.store.defer(entry_ids, self.backoff)
+            return 0
+
+        entries = [
+            (job["entry_id"], {
+                "text": text,
+                "metadata": self.pipeline.entry_metadata(job["timestamp_str"], job["img_path"]),
+                "embedding": embedding,
+                "fields": job["fields"],
+            })
+            for job, text, embedding in zip(jobs, texts, embeddings)
+        ]
+        with metrics.timer("store_write"):
+            self.pipeline.save_many(entries, done=entry_ids)
+        metrics.inc("ahtabyte_entries_saved_total", len(entries))
+        for job in jobs:
+            print(f"[{job['timestamp_str']}] Saved.")
+        return len(jobs)
+
+    def drain(self):
+        total = 0
+        while True:
+            processed = self.process_batch()
+            total += processed
+            if processed == 0:
+                return total
+
+    def run(self):
+        while not self._stop.is_set():
+            processed = 0
+            try:
+                if self.ready():
+                    processed = self.process_batch()
+            except Exception as e:
+                print(f"ERROR: {e}")
+                traceback.print_exc()
+            # Kuyrukta birikmiş iş varsa beklemeden devam et
+            if processed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import threading
+from src.core import config
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+METRICS_DIR = os.path.join(BASE_DIR, "data", "metrics")
+ENABLED = os.getenv("AHTABYTE_METRICS", "1") == "1"
+FLUSH_INTERVAL = int(os.getenv("AHTABYTE_METRICS_FLUSH", "60"))
+LOG_MAX_BYTES = 5 * 1024 * 1024  # aşılınca .log.1'e döner
+STALE_SECONDS = 86400  # bu kadar güncellenmeyen süreç anlık görüntüsü /metrics'te gösterilmez
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_gauges = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]:
+            i += 1
+        histogram[0][i] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+
+class _Timer:
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.started
+        observe(self.name, self.elapsed, **self.labels)
+        # Yarıda bırakılan akış (GeneratorExit) hata sayılmaz
+        if exc_type is not None and exc_type is not GeneratorExit:
+            inc("ahtabyte_stage_errors_total", **self.labels)
+        return False
+
+
+class _NoopTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def timer(stage, name="ahtabyte_stage_seconds"):
+    # Kapalıyken tek bir paylaşılan boş nesne döner; ölçüm maliyeti bir if
+    if not ENABLED:
+        return _NOOP
+    return _Timer(name, {"stage": stage})
+
+
+def record_usage(api, model, usage):
+    # OpenAI yanıtlarındaki token kullanımı; sahte istemcilerde usage olmayabilir
+    inc("ahtabyte_api_calls_total", api=api, model=model)
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        tokens = getattr(usage, kind, None)
+        if tokens:
+            inc("ahtabyte_tokens_total", tokens, api=api, model=model, kind=kind[:-len("_tokens")])
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": [[name, dict(labels), value] for (name, labels), value in _counters.items()],
+            "gauges": [[name, dict(labels), value] for (name, labels), value in _gauges.items()],
+            "histograms": [
+                [name, dict(labels), list(buckets), total, count]
+                for (name, labels), (buckets, total, count) in _histograms.items()
+            ],
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def render(snapshots):
+    # Prometheus metin formatı; snapshots: [(ek etiketler, snapshot())]
+    types, lines = {}, {}
+    for extra, snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            types[name] = "counter"
+            lines.setdefault(name, []).append(f"{name}{_labels({**labels, **extra})} {value}")
+        for name, labels, value in snap["gauges"]:
+            types[name] = "gauge"
+            lines.setdefault(name, []).append(f"{name}{_labels({**labels, **extra})} {value}")
+        for name, labels, buckets, total, count in snap["histograms"]:
+            types[name] = "histogram"
+            series = lines.setdefault(name, [])
+            cumulative = 0
+            for le, bucket in zip(list(BUCKETS) + ["+Inf"], buckets):
+                cumulative += bucket
+                series.append(f"{name}_bucket{_labels({**labels, **extra, 'le': le})} {cumulative}")
+            series.append(f"{name}_sum{_labels({**labels, **extra})} {total:.6f}")
+            series.append(f"{name}_count{_labels({**labels, **extra})} {count}")
+    out = []
+    for name in sorted(lines):
+        out.append(f"# TYPE {name} {types[name]}")
+        out.extend(lines[name])
+    return "\n".join(out) + "\n"
+
+
+def process_snapshots(exclude_pid=None):
+    # Diğer süreçlerin (repeater, PDF işçileri) diske yazdığı son anlık görüntüler
+    if not os.path.isdir(METRICS_DIR):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(METRICS_DIR)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data["pid"] == exclude_pid or time.time() - data["time"] > STALE_SECONDS:
+            continue
+        snapshots.append(({"process": data["process"], "pid": data["pid"]}, data["metrics"]))
+    return snapshots
+
+
+def _interval_summary(snap, previous):
+    # Günlük satırı: son flush'tan bu yana sayaç farkları, aşama başına adet / ortalama / yaklaşık p95
+    before = {(name, json.dumps(labels, sort_keys=True)): rest for name, labels, *rest in previous.get("histograms", [])}
+    stages = {}
+    for name, labels, buckets, total, count in snap["histograms"]:
+        old = before.get((name, json.dumps(labels, sort_keys=True)), [[0] * len(buckets), 0.0, 0])
+        delta = [b - a for a, b in zip(old[0], buckets)]
+        n = count - old[2]
+        if n <= 0:
+            continue
+        rank, cumulative, p95 = 0.95 * n, 0, None
+        for le, bucket in zip(list(BUCKETS) + [None], delta):
+            cumulative += bucket
+            if cumulative >= rank:
+                p95 = le
+                break
+        label = labels.get("stage", name)
+        stages[label] = {"count": n, "avg_ms": round((total - old[1]) / n * 1000, 1), "p95_le": p95}
+    old_counters = {(name, json.dumps(labels, sort_keys=True)): value for name, labels, value in previous.get("counters", [])}
+    counters = {}
+    for name, labels, value in snap["counters"]:
+        delta = value - old_counters.get((name, json.dumps(labels, sort_keys=True)), 0)
+        if delta:
+            counters[name + _labels(labels)] = delta
+    return {"stages": stages, "counters": counters}
+
+
+_last_flushed = {}
+
+
+def flush(process):
+    if not ENABLED:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    snap = snapshot()
+    now = time.time()
+    pid = os.getpid()
+    path = os.path.join(METRICS_DIR, f"{process}-{pid}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"process": process, "pid": pid, "time": now, "metrics": snap}, f)
+    os.replace(path + ".tmp", path)
+
+    log_path = os.path.join(METRICS_DIR, f"{process}.log")
+    if os.path.exists(log_path) and os.path.getsize(log_path) > LOG_MAX_BYTES:
+        os.replace(log_path, log_path + ".1")
+    summary = _interval_summary(snap, _last_flushed.get(process, {}))
+    _last_flushed[process] = snap
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"time": round(now, 3), "pid": pid, **summary}, ensure_ascii=False) + "\n")
+
+
+def start_flusher(process, interval=FLUSH_INTERVAL):
+    if not ENABLED:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                flush(process)
+            except Exception as e:
+                print(f"Metrics flush failed: {e}")
+
+    thread = threading.Thread(target=run, daemon=True, name=f"metrics-{process}")
+    thread.start()
+    return thread
@@ -1,31 +1,47 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-import json
 import re
-import ast
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
 from io import BytesIO
+from src.core.store import get_store, day_range, window_minutes
+from src.core import metrics
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
-DB_PATH = os.path.join(DATA_DIR, "db.json")
 os.makedirs(DATA_DIR, exist_ok=True)
+CHART_DPI = 150
+
+# matplotlib ve reportlab yavaş yüklenir; sadece rapor gerçekten üretilecekse import edilir (güncel rapor, sunucu)
+
+
+@lru_cache(maxsize=None)
+def font_name():
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
 
-try:
-    pdfmetrics.registerFont(TTFont("Arial", "arial.ttf"))
-    FONT_NAME = "Arial"
-except Exception:
-    FONT_NAME = "Helvetica"
+    try:
+        pdfmetrics.registerFont(TTFont("Arial", "arial.ttf"))
+        return "Arial"
+    except Exception:
+        return "Helvetica"
+
+
+@lru_cache(maxsize=None)
+def paragraph_styles():
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    styles = getSampleStyleSheet()
+    return {
+        "normal": ParagraphStyle('CustomNormal', parent=styles['Normal'], fontName=font_name(), fontSize=10, leading=14),
+        "title": ParagraphStyle('CustomTitle', parent=styles['Title'], fontName=font_name(), fontSize=18, spaceAfter=12),
+        "heading": ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontName=font_name(), fontSize=14, spaceAfter=8),
+    }
 
 def format_ai_text(ai_markdown_text):
     ai_markdown_text = re.sub(r"#+ (.*)", r'<b><font size="12">\1</font></b>', ai_markdown_text)
@@ -39,123 +55,134 @@ def format_ai_text(ai_markdown_text):
     return ai_markdown_text
 
 
-def _parse_active_windows(raw_value):
-    raw_value = (raw_value or "").strip()
-    if not raw_value:
-        return []
-    if raw_value.startswith("[") and raw_value.endswith("]"):
-        try:
-            parsed = ast.literal_eval(raw_value)
-            if isinstance(parsed, list):
-                return [str(x).strip() for x in parsed if str(x).strip()]
-        except Exception:
-            pass
-    return [w.strip(" []'\"") for w in raw_value.split(",") if w.strip(" []'\"")]
-
 def load_day_data(report_date):
-    if not os.path.exists(DB_PATH):
-        return []
-    with open(DB_PATH, "r", encoding="utf-8") as f:
-        database = json.load(f)
-    activity_entries = []
-    for entry_id, entry in database.items():
-        meta = entry["metadata"]
-        if meta["timestamp_str"][:10] == report_date:
-            entry_text = entry.get("text", "")
-            keyboard_count, mouse_count, active_windows = 0, 0, []
-            for line in entry_text.split("\n"):
-                if "KEY_COUNT:" in line or "KEYBOARD_TICKS:" in line:
-                    try:
-                        keyboard_count = int(line.split(":", 1)[1].strip())
-                    except Exception:
-                        pass
-                elif "MOUSE_COUNT:" in line or "MOUSE_TICKS:" in line:
-                    try:
-                        mouse_count = int(line.split(":", 1)[1].strip())
-                    except Exception:
-                        pass
-                elif "ACTIVE_WINDOWS:" in line:
-                    active_windows = _parse_active_windows(line.split(":", 1)[1])
-
-            activity_entries.append({
-                "time": meta["timestamp_str"][11:],
-                "keyboard": keyboard_count,
-                "mouse": mouse_count,
-                "windows": active_windows,
-            })
-    return sorted(activity_entries, key=lambda x: x["time"])
-
-def create_activity_chart(entries):
-    times = [e["time"][:5] for e in entries]
-    keyboard_counts = [e["keyboard"] for e in entries]
-    mouse_counts = [e["mouse"] for e in entries]
-    fig, ax = plt.subplots(figsize=(14, 4))
+    # Sadece o güne ait satırlar timestamp indeksinden sütun olarak okunur
+    start_ts, end_ts = day_range(report_date)
+    return get_store().columns(start_ts, end_ts)
+
+def create_activity_chart(day_data):
+    from matplotlib.figure import Figure
+    from matplotlib import dates as mdates
+
+    # Gerçek zaman ekseni: 30 sn'lik ve 10 dk'lık aralıklar orantılı görünür, aynı dakikadaki örnekler çakışmaz
+    times = [datetime.fromtimestamp(ts) for ts in day_data["timestamp"].tolist()]
+    # Örnekleme aralığı değişken; sayılar dakika başına orana çevrilir
+    per_minute = 60 / day_data["duration"]
+    keyboard_counts = day_data["key_count"] * per_minute
+    mouse_counts = day_data["mouse_count"] * per_minute
+    # pyplot'un global durumu yerine bağımsız Figure: thread'lerde güvenle çizilebilir
+    fig = Figure(figsize=(14, 4))
+    ax = fig.subplots()
     ax.plot(times, keyboard_counts, label="Keyboard", color="#4A90D9", linewidth=2)
     ax.plot(times, mouse_counts, label="Mouse", color="#E67E22", linewidth=2)
     ax.set_xlabel("Zaman")
-    ax.set_ylabel("Vuruş/Tıklama")
+    ax.set_ylabel("Vuruş/Tıklama (dk)")
     ax.legend()
     ax.grid(True, alpha=0.3)
-    step = max(1, len(times) // 10)
-    ax.set_xticks(range(0, len(times), step))
-    ax.set_xticklabels(times[::step], rotation=45)
-    plt.tight_layout()
+    locator = mdates.AutoDateLocator(maxticks=12)
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
     image_buffer = BytesIO()
-    plt.savefig(image_buffer, format="png", dpi=150)
-    plt.close()
+    fig.savefig(image_buffer, format="png", dpi=CHART_DPI)
     image_buffer.seek(0)
     return image_buffer
 
-def create_window_chart(entries):
-    window_counts = {}
-    for e in entries:
-        for w in e["windows"]:
-            if w:
-                window_counts[w] = window_counts.get(w, 0) + 1
-    if not window_counts:
+def create_window_chart(day_data):
+    ids, minutes = window_minutes(day_data)
+    if len(ids) == 0:
         return None
-    labels = list(window_counts.keys())[:15]
-    values = list(window_counts.values())[:15]
-    fig, ax = plt.subplots(figsize=(10, 5))
+    from matplotlib.figure import Figure
+
+    top = np.argsort(-minutes, kind="stable")[:15]
+    labels = [day_data["window_titles"][int(i)] for i in ids[top]]
+    values = minutes[top]
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
     ax.barh(labels, values, color="#4A90D9")
-    ax.set_xlabel("Dakika")
-    plt.tight_layout()
+    ax.set_xlabel("Odak süresi (dakika)")
+    fig.tight_layout()
     image_buffer = BytesIO()
-    plt.savefig(image_buffer, format="png", dpi=150)
-    plt.close()
+    fig.savefig(image_buffer, format="png", dpi=CHART_DPI)
     image_buffer.seek(0)
     return image_buffer
 
-def generate_pdf(date):
-    activity_entries = load_day_data(date)
-    if not activity_entries:
-        print(f"Veri bulunamadı: {date}")
-        return
+def fetch_ai_analysis(date):
+    try:
+        from src.core.rag import RAGPipeline
+        pipeline = RAGPipeline()
+        return pipeline.generate_report(date + " 00:00:00", date + " 23:59:59")
+    except Exception as e:
+        print(f"AI Analizi eklenemedi: {e}")
+        return None
+
+def _cache_path(output_pdf_path):
+    return output_pdf_path + ".json"
+
+def is_report_fresh(output_pdf_path, fingerprint):
+    if not os.path.exists(output_pdf_path) or not os.path.exists(_cache_path(output_pdf_path)):
+        return False
+    with open(_cache_path(output_pdf_path), "r", encoding="utf-8") as f:
+        return json.load(f).get("fingerprint") == fingerprint
+
+def generate_pdf(date, force=False):
+    with metrics.timer("generate_pdf"):
+        path = _generate_pdf(date, force)
+    # Rapor işleri ayrı süreçlerde çalışır; ölçümler /metrics ve günlük için diske yazılır
+    metrics.flush("pdf")
+    return path
+
+def _generate_pdf(date, force):
     output_pdf_path = os.path.join(DATA_DIR, f"report_{date}.pdf")
-    document = SimpleDocTemplate(output_pdf_path, pagesize=A4, topMargin=2 * cm, bottomMargin=2 * cm)
-    styles = getSampleStyleSheet()
-    
-    custom_normal = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontName=FONT_NAME, fontSize=10, leading=14)
-    custom_title = ParagraphStyle('CustomTitle', parent=styles['Title'], fontName=FONT_NAME, fontSize=18, spaceAfter=12)
-    custom_heading = ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontName=FONT_NAME, fontSize=14, spaceAfter=8)
+    start_ts, end_ts = day_range(date)
+    # Günün verisi değişmediyse (geçmiş günler) mevcut rapor aynen kullanılır
+    fingerprint = get_store().fingerprint(start_ts, end_ts)
+    if not force and is_report_fresh(output_pdf_path, fingerprint):
+        print(f"Rapor güncel: {output_pdf_path}")
+        return output_pdf_path
+
+    day_data = load_day_data(date)
+    if len(day_data["timestamp"]) == 0:
+        print(f"Veri bulunamadı: {date}")
+        return None
+
+    # AI analizi (ağ) ve grafik çizimi (CPU) aynı anda yürür
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        ai_future = pool.submit(fetch_ai_analysis, date)
+        activity_chart_future = pool.submit(create_activity_chart, day_data)
+        window_chart_future = pool.submit(create_window_chart, day_data)
+        activity_chart_buffer = activity_chart_future.result()
+        windows_chart_buffer = window_chart_future.result()
+        analysis_raw = ai_future.result()
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+
+    tmp_pdf_path = output_pdf_path + ".tmp"
+    document = SimpleDocTemplate(tmp_pdf_path, pagesize=A4, topMargin=2 * cm, bottomMargin=2 * cm)
+    styles = paragraph_styles()
+    custom_normal, custom_title, custom_heading = styles["normal"], styles["title"], styles["heading"]
 
     story = []
     story.append(Paragraph(f"Aktivite Raporu - {date}", custom_title))
     story.append(Spacer(1, 0.5 * cm))
     
-    total_keyboard = sum(e["keyboard"] for e in activity_entries)
-    total_mouse = sum(e["mouse"] for e in activity_entries)
+    total_keyboard = int(day_data["key_count"].sum())
+    total_mouse = int(day_data["mouse_count"].sum())
     
     summary_data = [
         ["Toplam Klavye Vuruşu", str(total_keyboard)],
         ["Toplam Fare Tıklaması", str(total_mouse)],
-        ["Kayıtlı Aktif Dakika", str(len(activity_entries))],
+        ["Kayıtlı Aktif Dakika", str(round(day_data["duration"].sum() / 60))],
     ]
     summary_table = Table(summary_data, colWidths=[8*cm, 8*cm])
     summary_table.setStyle(TableStyle([
         ("BACKGROUND", (0, 0), (-1, -1), colors.whitesmoke),
         ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ("FONTNAME", (0, 0), (-1, -1), FONT_NAME),
+        ("FONTNAME", (0, 0), (-1, -1), font_name()),
         ("FONTSIZE", (0, 0), (-1, -1), 11),
         ("PADDING", (0, 0), (-1, -1), 8),
     ]))
@@ -163,27 +190,43 @@ def generate_pdf(date):
     story.append(Spacer(1, 1 * cm))
     
     story.append(Paragraph("Zaman Çizelgesi", custom_heading))
-    story.append(Image(create_activity_chart(activity_entries), width=16 * cm, height=5 * cm))
+    story.append(Image(activity_chart_buffer, width=16 * cm, height=5 * cm))
     
-    windows_chart_buffer = create_window_chart(activity_entries)
     if windows_chart_buffer:
         story.append(Spacer(1, 1 * cm))
         story.append(Paragraph("Uygulama Kullanımı", custom_heading))
         story.append(Image(windows_chart_buffer, width=14 * cm, height=7 * cm))
 
-    try:
-        from src.core.rag import RAGPipeline
-        pipeline = RAGPipeline()
-        analysis_raw = pipeline.generate_report(date + " 00:00:00", date + " 23:59:59")
+    if analysis_raw:
         story.append(Spacer(1, 1 * cm))
         story.append(Paragraph("AI Analizi", custom_heading))
         story.append(Paragraph(format_ai_text(analysis_raw), custom_normal))
-    except Exception as e:
-        print(f"AI Analizi eklenemedi: {e}")
 
-    document.build(story)
+    with metrics.timer("pdf_build"):
+        document.build(story)
+    os.replace(tmp_pdf_path, output_pdf_path)
+    # AI analizi alınamadıysa önbelleğe yazma; bir sonraki çağrı tekrar denesin
+    if analysis_raw:
+        with open(_cache_path(output_pdf_path), "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "generated": datetime.now().isoformat()}, f)
+    elif os.path.exists(_cache_path(output_pdf_path)):
+        # Eski kayıt kalırsa parmak izi tuttuğu için analizsiz PDF güncel sayılırdı
+        os.remove(_cache_path(output_pdf_path))
     print(f"Rapor oluşturuldu: {output_pdf_path}")
+    return output_pdf_path
+
+def generate_range(start_date, end_date, workers=None, force=False):
+    first = datetime.strptime(start_date, "%Y-%m-%d")
+    last = datetime.strptime(end_date, "%Y-%m-%d")
+    dates = [(first + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((last - first).days + 1)]
+    # spawn: her süreç kendi SQLite bağlantısını açar, ebeveynin bağlantısı kopyalanmaz
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return dict(zip(dates, pool.map(generate_pdf, dates, [force] * len(dates))))
 
 if __name__ == "__main__":
-    date_input = input("Tarih (Örn: 2026-02-27): ")
-    generate_pdf(date_input)
\ No newline at end of file
+    if len(sys.argv) == 3:
+        generate_range(sys.argv[1], sys.argv[2])
+    else:
+        date_input = input("Tarih (Örn: 2026-02-27): ")
+        generate_pdf(date_input)
\ No newline at end of file
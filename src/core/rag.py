@@ -1,20 +1,39 @@
+import sys
 import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import base64
 import io
-import json
-from PIL import Image
 from datetime import datetime
-from math import sqrt
-from openai import OpenAI
-from dotenv import load_dotenv
-
-load_dotenv()
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from src.core import config
+from src.core.clients import openai_client
+from src.core.store import get_store, parse_time, entry_id
+from src.core.vectors import VectorIndex
+from src.core.ann import IVFIndex
+from src.core.visioncache import AnalysisCache, dhash
+from src.core.screenshots import get_screenshots
+from src.core.embedcache import EmbeddingCache, cache_key
+from src.core.embedders import make_embedder, EMBEDDER
+from src.core.resultcache import ResultCache, result_key
+from src.core.rollup import Rollups
+from src.core.context import pack_context, CONTEXT_TOKEN_BUDGET
+from src.core import metrics
+
+client = openai_client
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DB_PATH = os.path.join(BASE_DIR, "data", "db.json")
-EMBEDDING_MODEL = "text-embedding-3-small"
+ANN_ENABLED = os.getenv("AHTABYTE_ANN", "0") == "1"
+ANN_N_PROBE = int(os.getenv("AHTABYTE_ANN_PROBE", "16"))
+VISION_CACHE_PATH = os.path.join(BASE_DIR, "data", "vision_cache.json")
+VISION_CACHE_DISTANCE = int(os.getenv("AHTABYTE_VISION_CACHE_DISTANCE", "4"))
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "data", "embedding_cache.db")
+EMBEDDING_CACHE_SIZE = int(os.getenv("AHTABYTE_EMBEDDING_CACHE_SIZE", "50000"))
+RESULT_CACHE_PATH = os.path.join(BASE_DIR, "data", "result_cache.db")
+RESULT_CACHE_SIZE = int(os.getenv("AHTABYTE_RESULT_CACHE_SIZE", "1000"))
+RESULT_CACHE_TTL = int(os.getenv("AHTABYTE_RESULT_CACHE_TTL", str(7 * 86400)))
+RESULT_CACHE_SIMILARITY = float(os.getenv("AHTABYTE_RESULT_CACHE_SIMILARITY", "0.95"))
+CONTEXT_CANDIDATES = 50
+RETRIEVAL_MODE = os.getenv("AHTABYTE_RETRIEVAL", "hybrid")
+RRF_K = 60
 
 REPORT_TEMPLATE = """
 ## Genel Özet
@@ -34,166 +53,337 @@ REPORT_TEMPLATE = """
 """
 
 
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    # Skor ölçekleri farklı listeleri sadece sıralarıyla birleştirir: sum 1 / (k + sıra)
+    scores = {}
+    for ranking in rankings:
+        for rank, entry_id in enumerate(ranking):
+            scores[entry_id] = scores.get(entry_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
 class RAGPipeline:
 
-    def analyze(self, img_path):
-        img = Image.open(img_path)
-        img.thumbnail((1024, 768))
-        buffer = io.BytesIO()
-        img.save(buffer, format="JPEG", quality=70)
-        img_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{
-                "role": "user",
-                "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"}},
-                    {"type": "text", "text": "What do you see in this screenshot? Briefly explain."}
-                ]
-            }]
+    def __init__(self, store=None, use_ann=ANN_ENABLED, llm_client=None, retrieval_mode=RETRIEVAL_MODE, embedder=None):
+        self.store = store if store is not None else get_store()
+        self.client = llm_client or client
+        self.embedder = embedder or make_embedder(EMBEDDER, self.client)
+        # Farklı sağlayıcıların vektörleri ayrı koleksiyonlarda tutulur, asla karışmaz
+        self.store.use_collection(self.embedder.name)
+        # Var olan matrisin boyutu ayardan önce gelir; yeni sorgular eski vektörlerle karşılaştırılabilmeli
+        self.embedder.dim = self.store.vectors.dim or self.embedder.dim
+        ann = None
+        if use_ann:
+            ann = IVFIndex(self.store.vectors.path + ".ivf.npz", n_probe=ANN_N_PROBE)
+        self.index = VectorIndex(self.store, ann=ann)
+        self.vision_cache = AnalysisCache(VISION_CACHE_PATH, max_distance=VISION_CACHE_DISTANCE)
+        self.embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_SIZE)
+        self.result_cache = ResultCache(
+            RESULT_CACHE_PATH, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, similarity=RESULT_CACHE_SIMILARITY
         )
-        return response.choices[0].message.content
+        self.rollups = Rollups(self.store)
+        self.context_budget = CONTEXT_TOKEN_BUDGET
+        self.retrieval_mode = retrieval_mode
+
+    def warm_up(self):
+        # Yerel model yüklemesi ilk kayda/soruya yansımasın
+        self.embedder.warm_up()
+
+    def analyze(self, img_path=None, frame=None):
+        # frame: yakalama anında hedef boyuta küçültülmüş görüntü ve JPEG baytları (bkz. visscollect)
+        if frame is not None:
+            img, jpeg = frame["image"], frame["jpeg"]
+        else:
+            from PIL import Image
+
+            # Eski kareler arşiv segmentlerinde olabilir; yol indeks üzerinden çözülür
+            jpeg = get_screenshots().read(img_path)
+            img = Image.open(io.BytesIO(jpeg))
+            if img.format != "JPEG" or img.width > 1024 or img.height > 768:
+                jpeg = None
+
+        # Ekran neredeyse aynıysa önceki analizi tekrar kullan
+        image_hash = dhash(img)
+        cached = self.vision_cache.get(image_hash)
+        metrics.inc("ahtabyte_vision_cache_total", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+        if jpeg is None:
+            from src.core.visscollect import encode_frame
+
+            _, jpeg = encode_frame(img, quality=70)
+        img_base64 = base64.b64encode(jpeg).decode("utf-8")
+
+        with metrics.timer("vision"):
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{
+                    "role": "user",
+                    "content": [
+                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"}},
+                        {"type": "text", "text": "What do you see in this screenshot? Briefly explain."}
+                    ]
+                }]
+            )
+        metrics.record_usage("vision", "gpt-4o-mini", getattr(response, "usage", None))
+        analysis = response.choices[0].message.content
+        self.vision_cache.put(image_hash, analysis)
+        return analysis
+
+    def embed_many(self, texts):
+        texts = list(texts)
+        if not self.embedder.remote:
+            return self.embedder.embed(texts)
+        keys = [cache_key(text, self.embedder.cache_name) for text in texts]
+        cached = self.embedding_cache.get_many(keys)
+
+        # Önbellekte olmayan metinler tek bir API çağrısında embedding'e çevrilir
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        metrics.inc("ahtabyte_embedding_cache_total", len(cached), result="hit")
+        metrics.inc("ahtabyte_embedding_cache_total", len(missing), result="miss")
+        if missing:
+            fresh = list(zip(missing.keys(), self.embedder.embed(list(missing.values()))))
+            self.embedding_cache.put_many(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def save_many(self, entries, done=()):
+        entries = list(entries)
+        self.store.put_many(entries, done=done)
+        self.rollups.update(entry["metadata"]["timestamp"] for _, entry in entries)
+        # ANN listeleri ingest sırasında artımlı güncellenir
+        if self.index.ann is not None:
+            self.index.refresh()
 
     def embed(self, entry_id, text, metadata):
-        db = {}
-        if os.path.exists(DB_PATH) and os.path.getsize(DB_PATH) > 0:
-            with open(DB_PATH, "r", encoding="utf-8") as f:
-                db = json.load(f)
-
         # Metni embedding'e çevir ve metadata ile birlikte kaydet
-        emb_response = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=text,
-        )
-        embedding = emb_response.data[0].embedding
-
-        db[entry_id] = {
-            "text": text,
-            "metadata": metadata,
-            "embedding": embedding,
-        }
-
-        with open(DB_PATH, "w", encoding="utf-8") as f:
-            json.dump(db, f, ensure_ascii=False, indent=2)
+        embedding = self.embed_many([text])[0]
+        self.save_many([(entry_id, {"text": text, "metadata": metadata, "embedding": embedding})])
 
     @staticmethod
-    def _cosine_similarity(a, b):
-        dot = sum(x * y for x, y in zip(a, b))
-        norm_a = sqrt(sum(x * x for x in a))
-        norm_b = sqrt(sum(x * x for x in b))
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        return dot / (norm_a * norm_b)
-
-    def retrieve(self, query=None, start=None, end=None, n_results=10):
-        if not os.path.exists(DB_PATH):
-            return [], []
-
-        with open(DB_PATH, "r", encoding="utf-8") as f:
-            db = json.load(f)
-
-        # Zaman filtresine göre süz
-        filtered_entries = []
-        for entry in db.values():
-            meta = entry["metadata"]
-
-            if start and end:
-                start_ts = int(datetime.strptime(start, "%Y-%m-%d %H:%M:%S").timestamp())
-                end_ts = int(datetime.strptime(end, "%Y-%m-%d %H:%M:%S").timestamp())
-                if not (start_ts <= meta["timestamp"] <= end_ts):
-                    continue
-
-            filtered_entries.append(entry)
-
-        if not filtered_entries:
-            return [], []
-
-        # Eski kayıtlar için veya query yoksa: basitçe ilk N kaydı dön
-        has_any_embedding = any("embedding" in e for e in filtered_entries)
-        if not query or not has_any_embedding:
-            docs = [e["text"] for e in filtered_entries[:n_results]]
-            metadatas = [e["metadata"] for e in filtered_entries[:n_results]]
+    def _time_range(start, end):
+        if start and end:
+            return parse_time(start), parse_time(end, end_of_day=True)
+        return None, None
+
+    def retrieve(self, query=None, start=None, end=None, n_results=10, mode=None):
+        with metrics.timer("retrieve"):
+            return self._retrieve(query, start, end, n_results, mode)
+
+    def _retrieve(self, query, start, end, n_results, mode):
+        # mode: "hybrid" (BM25 + vektör, RRF), "vector" ya da "lexical" (ağ çağrısı yok)
+        mode = mode or self.retrieval_mode
+        # Zaman filtresi timestamp indeksi üzerinden çalışır
+        start_ts, end_ts = self._time_range(start, end)
+
+        rankings = []
+        if query and mode in ("hybrid", "lexical"):
+            rankings.append([entry_id for entry_id, _ in self.store.search_text(query, start_ts, end_ts, n_results * 2)])
+        if query and mode in ("hybrid", "vector") and self.index.count(start_ts, end_ts) > 0:
+            try:
+                # Soru embedding'i ile matris arasında tek bir matris-vektör çarpımı
+                q_emb = self.embed_many([query])[0]
+                rankings.append([entry_id for entry_id, _ in self.index.search(q_emb, start_ts, end_ts, n_results * 2)])
+            except Exception as e:
+                if mode == "vector":
+                    raise
+                print(f"Vector search unavailable, using lexical results: {e}")
+
+        # Eşleşme yoksa veya query yoksa: basitçe ilk N kaydı dön
+        if not any(rankings):
+            entries = self.store.range(start_ts, end_ts, with_embedding=False, limit=n_results)
+            docs = [e["text"] for e in entries]
+            metadatas = [e["metadata"] for e in entries]
             return docs, metadatas
 
-        # Soru embedding'i ile entry embedding'leri arasında kosinüs benzerliği hesapla
-        q_emb_resp = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=query,
-        )
-        q_emb = q_emb_resp.data[0].embedding
-
-        scored = []
-        for entry in filtered_entries:
-            if "embedding" not in entry:
-                continue
-            score = self._cosine_similarity(q_emb, entry["embedding"])
-            scored.append((score, entry))
-
-        if not scored:
-            return [], []
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        top_entries = [e for _, e in scored[:n_results]]
-
+        top_entries = self.store.get_many(reciprocal_rank_fusion(rankings)[:n_results])
         docs = [e["text"] for e in top_entries]
         metadatas = [e["metadata"] for e in top_entries]
         return docs, metadatas
 
-    def generate(self, question, docs, metadatas):
-        context = "\n---\n".join(docs)
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}]
-        )
+    def _generate_messages(self, question, docs, metadatas):
+        context = pack_context(docs, metadatas, self.context_budget)
+        return [{"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}]
+
+    def _report_messages(self, docs, metadatas, start, end):
+        context = pack_context(docs, metadatas, self.context_budget)
+        return [{
+            "role": "user",
+            "content": (
+                "Aşağıdaki verileri kullanarak odaklı ve kısa bir günlük/çalışma raporu üret. "
+                "Yanıtı TÜRKÇE ve markdown formatında ver. "
+                "Verilerde geçen 'TIME:', 'ACTIVE_WINDOWS:', 'KEY_COUNT:', 'MOUSE_COUNT:' ve "
+                "'SCREEN ANALYSIS:' kısımlarını özellikle kullan. "
+                "'ACTIVE_WINDOWS: [W1]' gibi etiketler WINDOW LISTS bölümündeki listeleri gösterir.\n\n"
+                "Kurallar:\n"
+                "- Gereksiz tekrar yapma, mümkün olduğunca öz ve net ol.\n"
+                "- 'Verilerde ekran analizi yoktur' gibi cümleleri sadece gerçekten hiç SCREEN ANALYSIS yoksa yaz.\n"
+                "- Aynı uygulamanın tekrarlarını grupla (örneğin sık kullanılan uygulamaları tek başlık altında özetle).\n\n"
+                f"Şablon:\n{REPORT_TEMPLATE}\n\n"
+                f"Veri:\n{context}\n"
+                f"Başlangıç zamanı: {start}\n"
+                f"Bitiş zamanı: {end}"
+            )
+        }]
+
+    def _complete(self, messages):
+        with metrics.timer("generate"):
+            response = self.client.chat.completions.create(model="gpt-4o", messages=messages)
+        metrics.record_usage("chat", "gpt-4o", getattr(response, "usage", None))
         return response.choices[0].message.content
 
+    def _stream(self, messages):
+        # Token'lar geldikçe döner; ilk parça tam yanıtı beklemeden gelir
+        with metrics.timer("generate_stream"):
+            stream = self.client.chat.completions.create(
+                model="gpt-4o", messages=messages, stream=True, stream_options={"include_usage": True}
+            )
+            usage = None
+            for chunk in stream:
+                # Kullanım bilgisi choices'ı boş son parçada gelir
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        metrics.record_usage("chat", "gpt-4o", usage)
+
+    def generate(self, question, docs, metadatas):
+        return self._complete(self._generate_messages(question, docs, metadatas))
+
+    def generate_stream(self, question, docs, metadatas):
+        return self._stream(self._generate_messages(question, docs, metadatas))
+
     def report(self, docs, metadatas, start, end):
-        context = "\n---\n".join(docs)
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{
-                "role": "user",
-                "content": (
-                    "Aşağıdaki verileri kullanarak odaklı ve kısa bir günlük/çalışma raporu üret. "
-                    "Yanıtı TÜRKÇE ve markdown formatında ver. "
-                    "Verilerde geçen 'TIME:', 'ACTIVE_WINDOWS:', 'KEY_COUNT:', 'MOUSE_COUNT:' ve "
-                    "'SCREEN ANALYSIS:' kısımlarını özellikle kullan.\n\n"
-                    "Kurallar:\n"
-                    "- Gereksiz tekrar yapma, mümkün olduğunca öz ve net ol.\n"
-                    "- 'Verilerde ekran analizi yoktur' gibi cümleleri sadece gerçekten hiç SCREEN ANALYSIS yoksa yaz.\n"
-                    "- Aynı uygulamanın tekrarlarını grupla (örneğin sık kullanılan uygulamaları tek başlık altında özetle).\n\n"
-                    f"Şablon:\n{REPORT_TEMPLATE}\n\n"
-                    f"Veri:\n{context}\n"
-                    f"Başlangıç zamanı: {start}\n"
-                    f"Bitiş zamanı: {end}"
-                )
-            }]
-        )
-        return response.choices[0].message.content
+        return self._complete(self._report_messages(docs, metadatas, start, end))
 
-    def ingest(self, text, timestamp, img_path=None):
-        screen_analysis = self.analyze(img_path) if img_path else "N/A"
-        full_text = text + "\nSCREEN ANALYSIS: " + screen_analysis
+    def report_stream(self, docs, metadatas, start, end):
+        return self._stream(self._report_messages(docs, metadatas, start, end))
+
+    @staticmethod
+    def entry_id(timestamp):
+        return entry_id(timestamp)
 
-        entry_id = f"entry_{timestamp.replace(' ', '_').replace(':', '-')}"
-        metadata = {
+    @staticmethod
+    def entry_metadata(timestamp, img_path=None):
+        return {
             "timestamp": int(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timestamp()),
             "timestamp_str": timestamp,
             "screenshot_path": img_path or ""
         }
 
-        self.embed(entry_id, full_text, metadata)
+    def summarize(self, text):
+        with metrics.timer("summarize"):
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{
+                    "role": "user",
+                    "content": (
+                        "Aşağıdaki aktivite verisini TÜRKÇE olarak 3-4 cümlede özetle. "
+                        "Kullanılan uygulamaları, sürelerini ve yapılan işi koru, tekrar etme.\n\n"
+                        f"{text}"
+                    )
+                }]
+            )
+        metrics.record_usage("chat", "gpt-4o-mini", getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    def ingest(self, text, timestamp, img_path=None, fields=None):
+        screen_analysis = self.analyze(img_path) if img_path else "N/A"
+        full_text = text + "\nSCREEN ANALYSIS: " + screen_analysis
+
+        embedding = self.embed_many([full_text])[0]
+        self.save_many([(self.entry_id(timestamp), {
+            "text": full_text,
+            "metadata": self.entry_metadata(timestamp, img_path),
+            "embedding": embedding,
+            "fields": fields,
+        })])
         print(f"[{timestamp}] Saved.")
 
-    def query(self, question):
-        docs, metadatas = self.retrieve(question)
-        return self.generate(question, docs, metadatas)
+    def enqueue(self, text, timestamp, img_path=None, fields=None):
+        # Örnekleme thread'i sadece yerel kuyruğa yazar; API çağrıları IngestWorker'da
+        self.store.enqueue(self.entry_id(timestamp), timestamp, text, img_path or "", fields)
+
+    def _cached_result(self, kind, question, start, end):
+        # Önbellek anahtarı: soru, aralık ve aralıktaki verinin parmak izi; döner: (yanıt ya da None, kaydetme fonksiyonu)
+        start_ts, end_ts = self._time_range(start, end)
+        fingerprint = self.store.fingerprint(start_ts, end_ts)
+        scope = f"{self.embedder.name}:{self.context_budget}"
+        key = result_key(kind, f"{scope}\0{question}", start_ts, end_ts)
+        cached = self.result_cache.get(key, fingerprint)
+        outcome = "hit"
+        embedding = None
+        # Lexical modda soru embedding'i ağ çağrısı olabilir; sadece birebir anahtar eşleşmesi kullanılır
+        if cached is None and question and self.embedder.semantic and self.retrieval_mode != "lexical":
+            try:
+                # Soru embedding'i önbelleğe girer, retrieve aynı embedding'i tekrar istemez
+                embedding = self.embed_many([question])[0]
+                cached = self.result_cache.get_similar(kind, start_ts, end_ts, fingerprint, scope, embedding)
+                outcome = "similar"
+            except Exception as e:
+                print(f"Similar result lookup skipped: {e}")
+        if cached is None:
+            self.result_cache.miss()
+            outcome = "miss"
+        metrics.inc("ahtabyte_result_cache_total", kind=kind, result=outcome)
+
+        def put(response):
+            self.result_cache.put(key, kind, start_ts, end_ts, fingerprint, scope, response, embedding)
+        return cached, put
+
+    @staticmethod
+    def _caching(tokens, put):
+        # Akış sonuna kadar okunursa tam yanıt önbelleğe girer; yarıda kesilen akış kaydedilmez
+        parts = []
+        for token in tokens:
+            parts.append(token)
+            yield token
+        put("".join(parts))
+
+    def query(self, question, start=None, end=None):
+        cached, put = self._cached_result("query", question, start, end)
+        if cached is not None:
+            return cached
+        docs, metadatas = self.retrieve(question, start, end, n_results=CONTEXT_CANDIDATES)
+        answer = self.generate(question, docs, metadatas)
+        put(answer)
+        return answer
+
+    def query_stream(self, question, start=None, end=None):
+        cached, put = self._cached_result("query", question, start, end)
+        if cached is not None:
+            return iter([cached])
+        docs, metadatas = self.retrieve(question, start, end, n_results=CONTEXT_CANDIDATES)
+        return self._caching(self.generate_stream(question, docs, metadatas), put)
+
+    def _report_context(self, start, end):
+        # Saatlik/günlük özetlerden kurulan bağlam token bütçesi içinde kalır
+        context = self.rollups.context(parse_time(start), parse_time(end, end_of_day=True), self.summarize)
+        if context:
+            return [context], []
 
-    def generate_report(self, start, end):
         question = f"Summarize activities between {start} and {end}"
-        docs, metadatas = self.retrieve(question, start=start, end=end)
-        return self.report(docs, metadatas, start, end)
+        return self.retrieve(question, start=start, end=end, n_results=CONTEXT_CANDIDATES)
+
+    def generate_report(self, start, end):
+        cached, put = self._cached_result("report", "", start, end)
+        if cached is not None:
+            return cached
+        docs, metadatas = self._report_context(start, end)
+        report = self.report(docs, metadatas, start, end)
+        put(report)
+        return report
+
+    def generate_report_stream(self, start, end):
+        cached, put = self._cached_result("report", "", start, end)
+        if cached is not None:
+            return iter([cached])
+        docs, metadatas = self._report_context(start, end)
+        return self._caching(self.report_stream(docs, metadatas, start, end), put)
 
 
 if __name__ == "__main__":
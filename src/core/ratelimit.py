@@ -0,0 +1,49 @@
+import threading
+import time
+
+
+def is_rate_limited(error):
+    return getattr(error, "status_code", None) == 429 or "429" in str(error)
+
+
+def retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None, min_rate=0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self, factor=0.5):
+        # 429 geldiğinde hızı yarıya indir (AIMD), biriken jetonları sıfırla
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate * factor)
+            self.tokens = 0
+
+    def recover(self, step=0.05):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + step * self.max_rate)
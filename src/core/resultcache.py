@@ -0,0 +1,136 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from src.core.embedcache import normalize_text
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS result_cache (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    start_ts INTEGER,
+    end_ts INTEGER,
+    fingerprint TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    embedding BLOB,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_result_cache_range ON result_cache(kind, start_ts, end_ts);
+CREATE INDEX IF NOT EXISTS idx_result_cache_last_used ON result_cache(last_used);
+"""
+
+EVICT_EVERY = 20
+
+
+def result_key(kind, question, start_ts, end_ts):
+    return hashlib.sha1(f"{kind}\0{normalize_text(question or '').lower()}\0{start_ts}\0{end_ts}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    # LLM yanıtları: soru + zaman aralığı + aralıktaki verinin parmak izi. Aralığa yeni kayıt gelince parmak izi
+    # değişir ve eski yanıt bir daha dönmez.
+
+    def __init__(self, path, max_entries=1000, ttl=7 * 86400, similarity=0.95):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._puts = 0
+
+    def _touch(self, key):
+        with self.conn:
+            self.conn.execute("UPDATE result_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def get(self, key, fingerprint):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT fingerprint, response, created FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] != fingerprint or time.time() - row[2] > self.ttl:
+                # Aralıktaki veri değişmiş ya da süresi dolmuş
+                with self.conn:
+                    self.conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                return None
+            self._touch(key)
+            self.hits += 1
+            return row[1]
+
+    def get_similar(self, kind, start_ts, end_ts, fingerprint, scope, embedding):
+        # Aynı aralık ve veri için anlamca çok yakın bir soru daha önce yanıtlandıysa onu dön
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query))
+        if query_norm == 0:
+            return None
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, embedding, response FROM result_cache "
+                "WHERE kind = ? AND start_ts IS ? AND end_ts IS ? AND fingerprint = ? AND scope = ? "
+                "AND created > ? AND embedding IS NOT NULL",
+                (kind, start_ts, end_ts, fingerprint, scope, time.time() - self.ttl),
+            ).fetchall()
+            vectors = [np.frombuffer(blob, dtype=np.float32) for _, blob, _ in rows]
+            rows = [row for row, vector in zip(rows, vectors) if len(vector) == len(query)]
+            vectors = [vector for vector in vectors if len(vector) == len(query)]
+            if not rows:
+                return None
+            matrix = np.stack(vectors)
+            scores = matrix @ query / np.maximum(np.linalg.norm(matrix, axis=1) * query_norm, 1e-12)
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                return None
+            self._touch(rows[best][0])
+            self.similar_hits += 1
+            return rows[best][2]
+
+    def miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def put(self, key, kind, start_ts, end_ts, fingerprint, scope, response, embedding=None):
+        now = time.time()
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, kind, start_ts, end_ts, fingerprint, scope, embedding, "
+                "response, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, start_ts, end_ts, fingerprint, scope, blob, response, now, now),
+            )
+            self._puts += 1
+            if self._puts >= EVICT_EVERY:
+                self._puts = 0
+                self.conn.execute("DELETE FROM result_cache WHERE created < ?", (now - self.ttl,))
+                self.conn.execute(
+                    "DELETE FROM result_cache WHERE key NOT IN "
+                    "(SELECT key FROM result_cache ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM result_cache")
+
+    def stats(self):
+        with self.lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+            total = self.hits + self.similar_hits + self.misses
+            return {
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "size": size,
+                "hit_rate": (self.hits + self.similar_hits) / total if total else 0.0,
+            }
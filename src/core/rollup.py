@@ -0,0 +1,171 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+from src.core.store import parse_entry_text, window_minutes
+
+MAX_ANALYSES = 8
+ANALYSIS_CHARS = 240
+TOP_WINDOWS = 10
+REPORT_TOKEN_BUDGET = 6000
+
+
+def estimate_tokens(text):
+    # Kaba tahmin: ~4 karakter = 1 token
+    return len(text) // 4 + 1
+
+
+def hour_start(ts):
+    return int(datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0).timestamp())
+
+
+def day_start(ts):
+    return int(datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+def aggregate_columns(columns, analyses):
+    # Saatlik kova: sayılar ve pencere dakikaları sütunlar üzerinde vektörel toplanır
+    ids, minutes = window_minutes(columns)
+    titles = columns["window_titles"]
+    windows = {titles[int(i)]: round(float(m), 1) for i, m in zip(ids, minutes)}
+    return aggregate([{
+        "entries": len(columns["timestamp"]),
+        "minutes": round(float(columns["duration"].sum()) / 60, 1),
+        "key_count": int(columns["key_count"].sum()),
+        "mouse_count": int(columns["mouse_count"].sum()),
+        "windows": windows,
+        "analyses": analyses,
+    }])
+
+
+def aggregate(parts):
+    data = {"entries": 0, "minutes": 0, "key_count": 0, "mouse_count": 0, "windows": {}, "analyses": []}
+    for part in parts:
+        data["entries"] += part["entries"]
+        # Süre alanından önce kaydedilmiş kovalarda her kayıt bir dakikadır
+        data["minutes"] = round(data["minutes"] + part.get("minutes", part["entries"]), 1)
+        data["key_count"] += part["key_count"]
+        data["mouse_count"] += part["mouse_count"]
+        for title, minutes in part["windows"].items():
+            data["windows"][title] = round(data["windows"].get(title, 0) + minutes, 1)
+        for analysis in part["analyses"]:
+            analysis = analysis[:ANALYSIS_CHARS]
+            if analysis and analysis not in data["analyses"] and len(data["analyses"]) < MAX_ANALYSES:
+                data["analyses"].append(analysis)
+    return data
+
+
+def format_rollup(level, rollup, with_analyses=True):
+    data = rollup["data"]
+    start = datetime.fromtimestamp(rollup["bucket_start"])
+    if level == "hour":
+        label = f"{start:%Y-%m-%d %H:00}-{start + timedelta(hours=1):%H:00}"
+    else:
+        label = f"{start:%Y-%m-%d}"
+    windows = sorted(data["windows"].items(), key=lambda item: item[1], reverse=True)[:TOP_WINDOWS]
+    lines = [
+        f"TIME: {label}",
+        f"ACTIVE_MINUTES: {data.get('minutes', data['entries'])}",
+        f"KEY_COUNT: {data['key_count']}",
+        f"MOUSE_COUNT: {data['mouse_count']}",
+        "ACTIVE_WINDOWS: " + ", ".join(f"{title} ({minutes} dk)" for title, minutes in windows),
+    ]
+    if with_analyses and data["analyses"]:
+        lines.append("SCREEN ANALYSIS:")
+        lines.extend(f"- {analysis}" for analysis in data["analyses"])
+    return "\n".join(lines)
+
+
+class Rollups:
+
+    def __init__(self, store, token_budget=REPORT_TOKEN_BUDGET, workers=4):
+        self.store = store
+        self.token_budget = token_budget
+        self.workers = workers
+
+    def update(self, timestamps):
+        hours = sorted({hour_start(ts) for ts in timestamps})
+        days = set()
+        for hour in hours:
+            # Saat kovası her seferinde kendi kayıtlarından yeniden hesaplanır; aynı kayıt iki kez sayılmaz
+            columns = self.store.columns(hour, hour + 3599)
+            if len(columns["timestamp"]) == 0:
+                continue
+            entries = self.store.range(hour, hour + 3599, with_embedding=False)
+            analyses = [parse_entry_text(entry["text"])["analysis"] for entry in entries]
+            self.store.put_rollup("hour", hour, aggregate_columns(columns, analyses))
+            days.add(day_start(hour))
+        for day in sorted(days):
+            next_day = int((datetime.fromtimestamp(day) + timedelta(days=1)).timestamp())
+            hour_rows = self.store.rollups("hour", day, next_day - 1)
+            self.store.put_rollup("day", day, aggregate(row["data"] for row in hour_rows))
+
+    def rebuild(self):
+        first_ts, last_ts = self.store.time_bounds()
+        if first_ts is None:
+            return
+        self.update(range(hour_start(first_ts), last_ts + 1, 3600))
+
+    def sync(self, start_ts, end_ts):
+        # migrate_json ya da özetlerden önceki sürümle yazılmış kayıtların saatleri hiç özetlenmemiş olabilir;
+        # kayıt sayısı tutmayan saat kovaları yeniden hesaplanır
+        first_hour = hour_start(start_ts)
+        timestamps = self.store.columns(first_hour, hour_start(end_ts) + 3599)["timestamp"]
+        if len(timestamps) == 0:
+            return
+        # Saat dilimi kaymaları 15 dakikanın katıdır; çeyrek saat başına bir temsilci yeterli
+        quarters, counts = np.unique(timestamps // 900, return_counts=True)
+        expected = {}
+        for quarter, count in zip(quarters.tolist(), counts.tolist()):
+            hour = hour_start(quarter * 900)
+            expected[hour] = expected.get(hour, 0) + count
+        stored = {row["bucket_start"]: row["data"]["entries"] for row in self.store.rollups("hour", first_hour, max(expected))}
+        stale = [hour for hour, count in expected.items() if stored.get(hour) != count]
+        if stale:
+            self.update(stale)
+
+    def context(self, start_ts, end_ts, summarize):
+        # Bir-iki günlük aralıklar saatlik, daha uzunları günlük özetlerden kurulur
+        self.sync(start_ts, end_ts)
+        level = "hour" if end_ts - start_ts <= 2 * 86400 else "day"
+        floor = hour_start(start_ts) if level == "hour" else day_start(start_ts)
+        rows = self.store.rollups(level, floor, end_ts)
+        if not rows:
+            return ""
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # Map: özeti olmayan kovalar paralel özetlenir ve saklanır
+            missing = [row for row in rows if row["summary"] is None]
+            for row, summary in zip(missing, pool.map(lambda r: summarize(format_rollup(level, r)), missing)):
+                row["summary"] = summary
+                self.store.set_rollup_summary(level, row["bucket_start"], summary)
+
+            blocks = [
+                format_rollup(level, row, with_analyses=False) + f"\nSUMMARY: {row['summary']}"
+                for row in rows
+            ]
+
+            # Reduce: bütçeyi aşarsa ardışık blokları gruplayıp tekrar özetle
+            while len(blocks) > 1 and sum(map(estimate_tokens, blocks)) > self.token_budget:
+                groups, current = [], []
+                for block in blocks:
+                    if current and sum(map(estimate_tokens, current + [block])) > self.token_budget // 2:
+                        groups.append(current)
+                        current = []
+                    current.append(block)
+                groups.append(current)
+                if len(groups) == len(blocks):
+                    groups = [blocks[i:i + 2] for i in range(0, len(blocks), 2)]
+                blocks = list(pool.map(lambda group: summarize("\n---\n".join(group)), groups))
+
+        return "\n---\n".join(blocks)
+
+
+if __name__ == "__main__":
+    from src.core.store import get_store
+
+    store = get_store()
+    Rollups(store).rebuild()
+    print(f"Rollups rebuilt: {len(store.rollups('hour'))} hours, {len(store.rollups('day'))} days")
@@ -0,0 +1,147 @@
+import os
+import time
+from collections import deque
+from src.core import config
+
+MIN_INTERVAL = 30
+BASE_INTERVAL = 60
+MAX_INTERVAL = 600
+BUSY_RATE = 60  # dakikada tuş + tık
+IDLE_RATE = 2
+BUSY_CAPTURE_EVERY = 60
+CAPTURE_EVERY = 180
+VISION_BUDGET = int(os.getenv("AHTABYTE_VISION_BUDGET", "30"))  # saatte en fazla ekran analizi; 0 = kapalı
+
+
+class SamplingScheduler:
+
+    def __init__(self, clock=time.time, min_interval=MIN_INTERVAL, base_interval=BASE_INTERVAL,
+                 max_interval=MAX_INTERVAL, busy_rate=BUSY_RATE, idle_rate=IDLE_RATE,
+                 busy_capture_every=BUSY_CAPTURE_EVERY, capture_every=CAPTURE_EVERY,
+                 vision_budget=VISION_BUDGET, trace_size=1440):
+        self.clock = clock
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.busy_rate = busy_rate
+        self.idle_rate = idle_rate
+        self.busy_capture_every = busy_capture_every
+        self.capture_every = capture_every
+        self.vision_budget = vision_budget
+        self.last_tick = None
+        self.next_time = clock()
+        self.interval = base_interval
+        self.windows = set()
+        self.focused = None
+        self.last_capture = None
+        self.captures = deque()
+        self.trace = deque(maxlen=trace_size)
+
+    def budget_left(self, now):
+        # Kayan bir saatlik pencere
+        while self.captures and self.captures[0] <= now - 3600:
+            self.captures.popleft()
+        return self.vision_budget - len(self.captures)
+
+    def window_changed(self, windows, focused=None):
+        # Öndeki pencere değişti mi (alt-tab, sekme değişimi, yeni pencere); odak bilinmiyorsa yeni açılan başlığa bakılır
+        if focused is not None:
+            return focused != self.focused
+        return bool(set(windows) - self.windows)
+
+    def poll(self, windows, activity=0, focused=None):
+        # Tick'ler arasında çağrılır; pencere değiştiyse ya da boşta beklerken kullanıcı döndüyse tick öne çekilir
+        now = self.clock()
+        if self.last_tick is None or now - self.last_tick < self.min_interval:
+            return False
+        woke = self.interval > self.base_interval and activity > 0
+        changed = self.window_changed(windows, focused) and self.budget_left(now) > 0
+        if not (woke or changed):
+            return False
+        self.next_time = now
+        return True
+
+    def tick(self, key_count, mouse_count, windows, focused=None):
+        now = self.clock()
+        elapsed = now - self.last_tick if self.last_tick is not None else self.base_interval
+        rate = (key_count + mouse_count) * 60 / max(elapsed, 1)
+
+        if rate >= self.busy_rate:
+            state, interval = "busy", self.min_interval
+        elif rate <= self.idle_rate:
+            # Boşta kaldıkça aralık katlanarak uzar
+            state = "idle"
+            interval = min(max(self.interval, self.base_interval) * 2, self.max_interval)
+        else:
+            state, interval = "active", self.base_interval
+
+        changed = self.last_tick is not None and self.window_changed(windows, focused)
+        since_capture = now - self.last_capture if self.last_capture is not None else float("inf")
+        if self.vision_budget <= 0:
+            capture, reason = False, "disabled"
+        elif self.budget_left(now) <= 0:
+            capture, reason = False, "budget"
+        elif changed:
+            capture, reason = True, "window"
+        elif state == "busy" and since_capture >= self.busy_capture_every:
+            capture, reason = True, "busy"
+        elif state == "active" and since_capture >= self.capture_every:
+            capture, reason = True, "periodic"
+        else:
+            capture, reason = False, state
+
+        self.last_tick = now
+        self.interval = interval
+        self.next_time = now + interval
+        self.windows = set(windows)
+        self.focused = focused
+        decision = {
+            "time": now,
+            "elapsed": int(round(elapsed)),
+            "rate": rate,
+            "state": state,
+            "interval": interval,
+            "capture": capture,
+            "reason": reason,
+        }
+        self.trace.append(decision)
+        return decision
+
+    def record_capture(self, now=None):
+        # Sadece gerçekten analize giden kareler bütçeden düşer (değişmeyen ekran atlanırsa sayılmaz)
+        now = self.clock() if now is None else now
+        self.last_capture = now
+        self.captures.append(now)
+
+
+class ManualClock:
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def replay(events, **kwargs):
+    # events: zamana göre sıralı (t, key_count, mouse_count, windows[, focused]); aralıktaki sayılar tick'te toplanır
+    clock = ManualClock(events[0][0] if events else 0.0)
+    scheduler = SamplingScheduler(clock=clock, **kwargs)
+    keys = clicks = 0
+    decisions = []
+    for t, key_count, mouse_count, event_windows, *rest in events:
+        focused = rest[0] if rest else None
+        clock.now = t
+        if t >= scheduler.next_time or scheduler.poll(event_windows, keys + clicks + key_count + mouse_count, focused):
+            decision = scheduler.tick(keys + key_count, clicks + mouse_count, event_windows, focused)
+            if decision["capture"]:
+                scheduler.record_capture()
+            decisions.append(decision)
+            keys = clicks = 0
+        else:
+            keys += key_count
+            clicks += mouse_count
+    return decisions
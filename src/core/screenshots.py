@@ -0,0 +1,269 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import io
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from src.core import config
+from src.core.visioncache import dhash
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCREENSHOTS_DIR = os.path.join(BASE_DIR, "data", "screenshots")
+ARCHIVE_DAYS = int(os.getenv("AHTABYTE_SCREENSHOT_ARCHIVE_DAYS", "1"))
+DOWNSAMPLE_DAYS = int(os.getenv("AHTABYTE_SCREENSHOT_DOWNSAMPLE_DAYS", "30"))
+DELETE_DAYS = int(os.getenv("AHTABYTE_SCREENSHOT_DELETE_DAYS", "0"))  # 0 = hiç silme
+DEDUP_DISTANCE = int(os.getenv("AHTABYTE_SCREENSHOT_DEDUP_DISTANCE", "2"))
+DOWNSAMPLE_SIZE = (640, 360)
+DOWNSAMPLE_QUALITY = 40
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    day TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    last_hash TEXT,
+    downsampled INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS frames (
+    name TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_frames_day ON frames(day);
+"""
+
+
+def frame_day(name):
+    # screen_20260305-142501.jpg -> 20260305
+    return name[len("screen_"):len("screen_") + 8]
+
+
+def frame_hash(data):
+    # PIL sadece sıkıştırma ve çözme yollarında gerekir; sunucu ham baytları okur
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    # JPEG'i küçük ölçekte çöz; dHash için tam çözünürlük gerekmez
+    img.draft("L", (160, 120))
+    return dhash(img)
+
+
+class ScreenshotStore:
+
+    def __init__(self, root=SCREENSHOTS_DIR, archive_days=ARCHIVE_DAYS, downsample_days=DOWNSAMPLE_DAYS,
+                 delete_days=DELETE_DAYS, dedup_distance=DEDUP_DISTANCE):
+        self.root = root
+        self.archive_dir = os.path.join(root, "archive")
+        self.archive_days = archive_days
+        self.downsample_days = downsample_days
+        self.delete_days = delete_days
+        self.dedup_distance = dedup_distance
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(self.archive_dir, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def _loose_path(self, img_path):
+        if os.path.isabs(img_path):
+            return img_path
+        return os.path.join(BASE_DIR, img_path)
+
+    def read(self, img_path):
+        # Önce diskteki dosya, yoksa arşiv indeksindeki segment; screenshot_path değişmeden çözülür
+        for path in (self._loose_path(img_path), os.path.join(self.root, os.path.basename(img_path))):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT s.file, f.offset, f.length FROM frames f JOIN segments s ON s.day = f.day WHERE f.name = ?",
+                (os.path.basename(img_path),),
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(img_path)
+        with open(os.path.join(self.archive_dir, row[0]), "rb") as f:
+            f.seek(row[1])
+            return f.read(row[2])
+
+    def open(self, img_path):
+        from PIL import Image
+
+        return Image.open(io.BytesIO(self.read(img_path)))
+
+    def _loose_names(self):
+        return sorted(
+            entry.name for entry in os.scandir(self.root)
+            if entry.is_file() and entry.name.startswith("screen_") and entry.name.endswith(".jpg")
+        )
+
+    def names(self, after=""):
+        with self.lock:
+            archived = [row[0] for row in self.conn.execute(
+                "SELECT name FROM frames WHERE name > ? ORDER BY name", (after,)
+            )]
+        loose = [name for name in self._loose_names() if name > after]
+        return sorted(set(archived).union(loose))
+
+    def _cutoff(self, days, now):
+        return (datetime.fromtimestamp(now) - timedelta(days=days)).strftime("%Y%m%d")
+
+    def compact(self, now=None):
+        now = time.time() if now is None else now
+        stats = {"archived": 0, "deduplicated": 0, "downsampled": 0, "deleted": 0}
+        delete_before = self._cutoff(self.delete_days, now) if self.delete_days else ""
+
+        by_day = {}
+        for name in self._loose_names():
+            by_day.setdefault(frame_day(name), []).append(name)
+        archive_before = self._cutoff(self.archive_days, now)
+        for day, names in sorted(by_day.items()):
+            if day < delete_before:
+                for name in names:
+                    os.remove(os.path.join(self.root, name))
+                stats["deleted"] += len(names)
+            elif day < archive_before:
+                archived, deduplicated = self._archive_day(day, names)
+                stats["archived"] += archived
+                stats["deduplicated"] += deduplicated
+
+        with self.lock:
+            segments = self.conn.execute("SELECT day, file, downsampled FROM segments ORDER BY day").fetchall()
+        downsample_before = self._cutoff(self.downsample_days, now) if self.downsample_days else ""
+        for day, file, downsampled in segments:
+            if day < delete_before:
+                stats["deleted"] += self._delete_day(day, file)
+            elif day < downsample_before and not downsampled:
+                self._downsample_day(day, file)
+                stats["downsampled"] += 1
+        return stats
+
+    def _archive_day(self, day, names):
+        with self.lock:
+            row = self.conn.execute("SELECT file, last_hash FROM segments WHERE day = ?", (day,)).fetchone()
+            known = {r[0] for r in self.conn.execute("SELECT name FROM frames WHERE day = ?", (day,))}
+        file, last_hash = row if row else (f"{day}.seg", None)
+        last_hash = int(last_hash, 16) if last_hash else None
+
+        rows, last_frame, deduplicated = [], None, 0
+        with self.lock:
+            if last_hash is not None:
+                last_frame = self.conn.execute(
+                    "SELECT offset, length FROM frames WHERE day = ? ORDER BY offset DESC LIMIT 1", (day,)
+                ).fetchone()
+        with open(os.path.join(self.archive_dir, file), "ab") as segment:
+            for name in names:
+                if name in known:
+                    continue
+                with open(os.path.join(self.root, name), "rb") as f:
+                    data = f.read()
+                image_hash = frame_hash(data)
+                # Ardışık neredeyse aynı kareler tek kopya olarak saklanır
+                if last_frame is not None and (image_hash ^ last_hash).bit_count() <= self.dedup_distance:
+                    rows.append((name, day, *last_frame))
+                    deduplicated += 1
+                    continue
+                offset = segment.tell()
+                segment.write(data)
+                last_frame, last_hash = (offset, len(data)), image_hash
+                rows.append((name, day, offset, len(data)))
+            segment.flush()
+            os.fsync(segment.fileno())
+
+        # İndeks ancak segment diske yazıldıktan sonra güncellenir, dosyalar ondan sonra silinir
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO segments (day, file, last_hash, downsampled) "
+                "VALUES (?, ?, ?, COALESCE((SELECT downsampled FROM segments WHERE day = ?), 0))",
+                (day, file, f"{last_hash:016x}" if last_hash is not None else None, day),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO frames (name, day, offset, length) VALUES (?, ?, ?, ?)", rows
+            )
+        for name in names:
+            os.remove(os.path.join(self.root, name))
+        return len(rows), deduplicated
+
+    def _downsample_day(self, day, file):
+        from PIL import Image
+
+        with self.lock:
+            frames = self.conn.execute(
+                "SELECT name, offset, length FROM frames WHERE day = ? ORDER BY offset", (day,)
+            ).fetchall()
+        generation = int(file.split(".")[1]) + 1 if file.count(".") == 2 else 1
+        new_file = f"{day}.{generation}.seg"
+
+        # Yeni segment ayrı dosyaya yazılır; indeks ona geçtikten sonra eskisi silinir
+        moved = {}
+        with open(os.path.join(self.archive_dir, file), "rb") as src, \
+                open(os.path.join(self.archive_dir, new_file), "wb") as dst:
+            for _, offset, length in frames:
+                if (offset, length) in moved:
+                    continue
+                src.seek(offset)
+                img = Image.open(io.BytesIO(src.read(length)))
+                img.draft("RGB", DOWNSAMPLE_SIZE)
+                img = img.convert("RGB")
+                img.thumbnail(DOWNSAMPLE_SIZE)
+                buffer = io.BytesIO()
+                img.save(buffer, format="JPEG", quality=DOWNSAMPLE_QUALITY)
+                moved[(offset, length)] = (dst.tell(), buffer.tell())
+                dst.write(buffer.getvalue())
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE frames SET offset = ?, length = ? WHERE name = ?",
+                [(*moved[(offset, length)], name) for name, offset, length in frames],
+            )
+            self.conn.execute("UPDATE segments SET file = ?, downsampled = 1 WHERE day = ?", (new_file, day))
+        os.remove(os.path.join(self.archive_dir, file))
+
+    def _delete_day(self, day, file):
+        with self.lock, self.conn:
+            count = self.conn.execute("DELETE FROM frames WHERE day = ?", (day,)).rowcount
+            self.conn.execute("DELETE FROM segments WHERE day = ?", (day,))
+        path = os.path.join(self.archive_dir, file)
+        if os.path.exists(path):
+            os.remove(path)
+        return count
+
+    def stats(self):
+        with self.lock:
+            frames, unique = self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT day || ':' || offset) FROM frames"
+            ).fetchone()
+            files = [row[0] for row in self.conn.execute("SELECT file FROM segments")]
+        size = sum(os.path.getsize(os.path.join(self.archive_dir, f)) for f in files
+                   if os.path.exists(os.path.join(self.archive_dir, f)))
+        return {
+            "loose": len(self._loose_names()),
+            "archived": frames,
+            "stored": unique,
+            "segments": len(files),
+            "archive_bytes": size,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_screenshots = None
+
+
+def get_screenshots():
+    global _screenshots
+    if _screenshots is None:
+        _screenshots = ScreenshotStore()
+    return _screenshots
+
+
+if __name__ == "__main__":
+    screenshots = get_screenshots()
+    print(screenshots.compact())
+    print(screenshots.stats())
@@ -0,0 +1,671 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import ast
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+import numpy as np
+from src.core import config
+from src.core.vectors import EmbeddingMatrix
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+STORE_PATH = os.path.join(DATA_DIR, "activity.db")
+VECTORS_PATH = os.path.join(DATA_DIR, "embeddings.f32")
+LEGACY_DB_PATH = os.path.join(DATA_DIR, "db.json")
+# BM25 ağırlıkları: metin, pencere başlıkları
+FTS_WEIGHTS = (1.0, 2.0)
+DEFAULT_DURATION = 60
+# Sağlayıcılar eklenmeden önce tek koleksiyon OpenAI embedding'leriydi
+DEFAULT_COLLECTION = "openai:text-embedding-3-small"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry_id TEXT NOT NULL UNIQUE,
+    timestamp INTEGER NOT NULL,
+    timestamp_str TEXT NOT NULL,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    embedding BLOB,
+    vec_row INTEGER,
+    vec_collection INTEGER,
+    key_count INTEGER,
+    mouse_count INTEGER,
+    window_ids BLOB,
+    duration INTEGER,
+    dwell BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries(timestamp);
+CREATE TABLE IF NOT EXISTS pending (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry_id TEXT NOT NULL UNIQUE,
+    timestamp_str TEXT NOT NULL,
+    text TEXT NOT NULL,
+    img_path TEXT NOT NULL DEFAULT '',
+    analysis TEXT,
+    fields TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    next_attempt REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS windows (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    level TEXT NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    summary TEXT,
+    PRIMARY KEY (level, bucket_start)
+);
+CREATE TABLE IF NOT EXISTS collections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    text, windows, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def parse_time(value, end_of_day=False):
+    if not value:
+        return None
+    try:
+        return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp())
+    except ValueError:
+        day = datetime.strptime(value, "%Y-%m-%d")
+    if end_of_day:
+        day += timedelta(days=1)
+        return int(day.timestamp()) - 1
+    return int(day.timestamp())
+
+
+def day_range(report_date):
+    return parse_time(report_date), parse_time(report_date, end_of_day=True)
+
+
+def entry_id(timestamp):
+    return f"entry_{timestamp.replace(' ', '_').replace(':', '-')}"
+
+
+def parse_entry_text(text):
+    # Yapısal alanları olmayan eski kayıtlar için metinden ayrıştırma
+    parsed = {"key_count": 0, "mouse_count": 0, "windows": [], "analysis": ""}
+    # Görsel analizi çok satırlı olabilir; etiketten metnin sonuna kadar hepsi analizdir
+    head, label, analysis = ("\n" + text).partition("\nSCREEN ANALYSIS:")
+    analysis = analysis.strip()
+    if label and analysis != "N/A":
+        parsed["analysis"] = analysis
+    for line in head.split("\n"):
+        label, _, value = line.partition(":")
+        value = value.strip()
+        if label in ("KEY_COUNT", "KEYBOARD_TICKS"):
+            parsed["key_count"] = int(value) if value.isdigit() else 0
+        elif label in ("MOUSE_COUNT", "MOUSE_TICKS"):
+            parsed["mouse_count"] = int(value) if value.isdigit() else 0
+        elif label == "ACTIVE_WINDOWS":
+            try:
+                windows = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                windows = value.split(",")
+            if not isinstance(windows, (list, tuple)):
+                windows = [windows]
+            parsed["windows"] = [str(w).strip(" []'\"") for w in windows if str(w).strip(" []'\"")]
+    return parsed
+
+
+def window_text(fields, text):
+    fields = fields or parse_entry_text(text)
+    titles = list(fields.get("windows", [])) + list(fields.get("dwell") or {})
+    return " ".join(dict.fromkeys(titles))
+
+
+def fts_query(query):
+    # Serbest metin -> FTS5 sorgusu: her kelime ön ek olarak, OR ile
+    terms = [term for term in re.findall(r"\w+", query.lower()) if len(term) > 1]
+    return " OR ".join(f'"{term}"*' for term in dict.fromkeys(terms))
+
+
+def window_minutes(columns):
+    # Odak süresi olan kayıtlarda pencere, öne çıktığı süre kadar dakika alır;
+    # eski kayıtlarda her açık pencere kaydın süresi kadar sayılır
+    has_dwell = np.diff(columns["dwell_offsets"]) > 0
+    durations = np.where(has_dwell, 0, columns["duration"])
+    ids = np.concatenate((columns["window_ids"], columns["dwell_ids"]))
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.int32), np.empty(0)
+    weights = np.concatenate((
+        np.repeat(durations, np.diff(columns["window_offsets"])) / 60,
+        columns["dwell_ms"] / 60000,
+    ))
+    ids, inverse = np.unique(ids, return_inverse=True)
+    minutes = np.bincount(inverse, weights=weights)
+    keep = minutes > 0
+    return ids[keep], minutes[keep]
+
+
+def _unpack_embedding(blob):
+    if blob is None:
+        return None
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class SQLiteStore:
+
+    def __init__(self, path=STORE_PATH, vectors_path=VECTORS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: okuyucular yazarı bloklamaz, yarım kalan yazma eski veriyi bozmaz
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.vectors_path = vectors_path
+        self._window_ids = {}
+        self._upgrade()
+        self._upgrade_fts()
+        # Her embedding sağlayıcısının ayrı matrisi (koleksiyonu) var; son kullanılan açılır
+        row = self.conn.execute("SELECT name FROM collections ORDER BY last_used DESC LIMIT 1").fetchone()
+        self.collection_id = None
+        self.use_collection(row[0] if row else DEFAULT_COLLECTION)
+
+    def _upgrade(self):
+        added_columns = {
+            "entries": [("vec_row", "INTEGER"), ("vec_collection", "INTEGER"), ("key_count", "INTEGER"), ("mouse_count", "INTEGER"), ("window_ids", "BLOB"), ("duration", "INTEGER"), ("dwell", "BLOB")],
+            "pending": [("fields", "TEXT")],
+        }
+        for table, new_columns in added_columns.items():
+            columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            for name, column_type in new_columns:
+                if name not in columns:
+                    with self.conn:
+                        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+        # Eski BLOB embedding'leri matrise taşı
+        legacy = self.conn.execute(
+            "SELECT seq, embedding FROM entries WHERE embedding IS NOT NULL AND vec_row IS NULL"
+        ).fetchall()
+        if legacy:
+            vec_rows = EmbeddingMatrix(self.vectors_path).append_many([_unpack_embedding(blob) for _, blob in legacy])
+            updates = [(vec_row, seq) for vec_row, (seq, _) in zip(vec_rows, legacy)]
+            with self.conn:
+                self.conn.executemany("UPDATE entries SET vec_row = ?, embedding = NULL WHERE seq = ?", updates)
+
+        # Koleksiyonlardan önceki satırlar varsayılan koleksiyona aittir
+        untagged = self.conn.execute(
+            "SELECT 1 FROM entries WHERE vec_row IS NOT NULL AND vec_collection IS NULL LIMIT 1"
+        ).fetchone()
+        if untagged:
+            collection_id, _ = self._collection(DEFAULT_COLLECTION)
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE entries SET vec_collection = ? WHERE vec_row IS NOT NULL AND vec_collection IS NULL",
+                    (collection_id,),
+                )
+
+        # Sayılar ve pencere listesi sadece metinde olan eski kayıtları bir kez ayrıştır
+        unparsed = self.conn.execute("SELECT seq, text FROM entries WHERE key_count IS NULL").fetchall()
+        if unparsed:
+            updates = []
+            for seq, text in unparsed:
+                key_count, mouse_count, window_ids, _, _ = self._structured_fields(None, text)
+                updates.append((key_count, mouse_count, window_ids, seq))
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE entries SET key_count = ?, mouse_count = ?, window_ids = ? WHERE seq = ?", updates
+                )
+
+    def _upgrade_fts(self):
+        # FTS indeksi olmayan kayıtları (eski veritabanı) bir kez indeksle
+        missing = self.conn.execute(
+            "SELECT seq, text FROM entries WHERE seq NOT IN (SELECT rowid FROM entries_fts)"
+        ).fetchall()
+        if missing:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO entries_fts (rowid, text, windows) VALUES (?, ?, ?)",
+                    [(seq, text, window_text(None, text)) for seq, text in missing],
+                )
+
+    def _collection_path(self, name):
+        if name == DEFAULT_COLLECTION:
+            return os.path.basename(self.vectors_path)
+        root, ext = os.path.splitext(os.path.basename(self.vectors_path))
+        return f"{root}-{re.sub(r'[^A-Za-z0-9]+', '-', name).strip('-')}{ext}"
+
+    def _collection(self, name):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO collections (name, path, last_used) VALUES (?, ?, ?)",
+                (name, self._collection_path(name), time.time()),
+            )
+        return self.conn.execute("SELECT id, path FROM collections WHERE name = ?", (name,)).fetchone()
+
+    def use_collection(self, name):
+        # Vektörler sadece aynı sağlayıcının vektörleriyle karşılaştırılır; diğer koleksiyonlardaki kayıtlar
+        # vektör aramasında görünmez (BM25 ile bulunmaya devam eder)
+        with self.lock:
+            collection_id, path = self._collection(name)
+            with self.conn:
+                self.conn.execute("UPDATE collections SET last_used = ? WHERE id = ?", (time.time(), collection_id))
+        if collection_id != self.collection_id:
+            self.vectors = EmbeddingMatrix(os.path.join(os.path.dirname(self.vectors_path), path))
+            self.collection = name
+            self.collection_id = collection_id
+        return self.vectors
+
+    def collections(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT c.id, c.name, c.path, COUNT(e.seq) FROM collections c "
+                "LEFT JOIN entries e ON e.vec_collection = c.id GROUP BY c.id ORDER BY c.id"
+            ).fetchall()
+        collections = []
+        for collection_id, name, path, entries in rows:
+            matrix = EmbeddingMatrix(os.path.join(os.path.dirname(self.vectors_path), path))
+            collections.append({
+                "name": name,
+                "dim": matrix.dim,
+                "entries": entries,
+                "active": collection_id == self.collection_id,
+            })
+        return collections
+
+    def intern_windows(self, titles):
+        missing = [title for title in dict.fromkeys(titles) if title not in self._window_ids]
+        if missing:
+            with self.lock, self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO windows (title) VALUES (?)", [(t,) for t in missing])
+                placeholders = ", ".join("?" for _ in missing)
+                rows = self.conn.execute(
+                    f"SELECT title, id FROM windows WHERE title IN ({placeholders})", missing
+                ).fetchall()
+            self._window_ids.update(rows)
+        return [self._window_ids[title] for title in titles]
+
+    def window_titles(self, window_ids):
+        window_ids = [int(i) for i in window_ids]
+        if not window_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in window_ids)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT id, title FROM windows WHERE id IN ({placeholders})", window_ids
+            ).fetchall()
+        return dict(rows)
+
+    def _structured_fields(self, fields, text):
+        fields = fields or parse_entry_text(text)
+        window_ids = np.asarray(self.intern_windows(fields.get("windows", [])), dtype=np.int32)
+        duration = fields.get("duration")
+        # Odak süresi: (pencere id, milisaniye) çiftleri, int32
+        dwell = fields.get("dwell") or {}
+        dwell_pairs = np.column_stack((
+            np.asarray(self.intern_windows(list(dwell)), dtype=np.int32),
+            np.asarray([round(seconds * 1000) for seconds in dwell.values()], dtype=np.int32),
+        )) if dwell else None
+        return (
+            int(fields.get("key_count", 0)),
+            int(fields.get("mouse_count", 0)),
+            window_ids.tobytes(),
+            int(duration) if duration is not None else None,
+            dwell_pairs.tobytes() if dwell_pairs is not None else None,
+        )
+
+    def _row_to_entry(self, row, with_embedding):
+        entry = {
+            "id": row[0],
+            "text": row[1],
+            "metadata": json.loads(row[2]),
+        }
+        if with_embedding and row[3] is not None and row[4] == self.collection_id:
+            entry["embedding"] = self.vectors.get(row[3])
+        return entry
+
+    def _entry_row(self, entry_id, text, metadata, vec_row, fields=None):
+        return (
+            entry_id,
+            int(metadata["timestamp"]),
+            metadata.get("timestamp_str", ""),
+            text,
+            json.dumps(metadata, ensure_ascii=False),
+            vec_row,
+            self.collection_id if vec_row is not None else None,
+            *self._structured_fields(fields, text),
+        )
+
+    def _write_entries(self, rows, windows):
+        # Lock ve transaction içinde çağrılır; FTS satırı kaydın seq'i ile eşleşir, her yazmada yenilenir
+        entry_ids = [(row[0],) for row in rows]
+        self.conn.executemany(
+            "DELETE FROM entries_fts WHERE rowid = (SELECT seq FROM entries WHERE entry_id = ?)", entry_ids
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO entries (entry_id, timestamp, timestamp_str, text, metadata, vec_row, vec_collection, "
+            "key_count, mouse_count, window_ids, duration, dwell) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.conn.executemany(
+            "INSERT INTO entries_fts (rowid, text, windows) SELECT seq, text, ? FROM entries WHERE entry_id = ?",
+            [(window_text, row[0]) for row, window_text in zip(rows, windows)],
+        )
+
+    def put(self, entry_id, text, metadata, embedding=None, fields=None):
+        vec_row = self.vectors.append(embedding) if embedding is not None else None
+        row = self._entry_row(entry_id, text, metadata, vec_row, fields)
+        with self.lock, self.conn:
+            self._write_entries([row], [window_text(fields, text)])
+
+    def put_many(self, entries, done=()):
+        entries = list(entries)
+        with_embedding = [entry for _, entry in entries if entry.get("embedding") is not None]
+        vec_rows = iter(self.vectors.append_many([e["embedding"] for e in with_embedding]) if with_embedding else [])
+        rows = [
+            self._entry_row(
+                entry_id,
+                entry.get("text", ""),
+                entry["metadata"],
+                next(vec_rows) if entry.get("embedding") is not None else None,
+                entry.get("fields"),
+            )
+            for entry_id, entry in entries
+        ]
+        windows = [window_text(entry.get("fields"), entry.get("text", "")) for _, entry in entries]
+        with self.lock, self.conn:
+            self._write_entries(rows, windows)
+            # Kuyruktan silme ile kayıt aynı transaction içinde: ya ikisi ya hiçbiri
+            self.conn.executemany("DELETE FROM pending WHERE entry_id = ?", [(entry_id,) for entry_id in done])
+        return len(rows)
+
+    def search_text(self, query, start_ts=None, end_ts=None, limit=50):
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = (
+            f"SELECT e.entry_id, bm25(entries_fts, {FTS_WEIGHTS[0]}, {FTS_WEIGHTS[1]}) AS score "
+            "FROM entries_fts JOIN entries e ON e.seq = entries_fts.rowid WHERE entries_fts MATCH ?"
+        )
+        params = [match]
+        if start_ts is not None:
+            sql += " AND e.timestamp >= ?"
+            params.append(int(start_ts))
+        if end_ts is not None:
+            sql += " AND e.timestamp <= ?"
+            params.append(int(end_ts))
+        sql += " ORDER BY score LIMIT ?"
+        params.append(int(limit))
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        # bm25() küçük = iyi; işaret çevrilerek büyük = iyi döner
+        return [(entry_id, -score) for entry_id, score in rows]
+
+    def enqueue(self, entry_id, timestamp_str, text, img_path="", fields=None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pending (entry_id, timestamp_str, text, img_path, fields, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (entry_id, timestamp_str, text, img_path or "", json.dumps(fields) if fields else None, time.time()),
+            )
+
+    def pending(self, limit=16):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT entry_id, timestamp_str, text, img_path, analysis, attempts, fields FROM pending "
+                "WHERE next_attempt <= ? ORDER BY seq LIMIT ?",
+                (time.time(), int(limit)),
+            ).fetchall()
+        return [
+            {
+                "entry_id": row[0],
+                "timestamp_str": row[1],
+                "text": row[2],
+                "img_path": row[3],
+                "analysis": row[4],
+                "attempts": row[5],
+                "fields": json.loads(row[6]) if row[6] else None,
+            }
+            for row in rows
+        ]
+
+    def pending_stats(self):
+        with self.lock:
+            count, oldest = self.conn.execute(
+                "SELECT COUNT(*), MIN(created) FROM pending WHERE next_attempt <= ?", (time.time(),)
+            ).fetchone()
+        return count, oldest
+
+    def set_analysis(self, entry_id, analysis):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE pending SET analysis = ? WHERE entry_id = ?", (analysis, entry_id))
+
+    def defer(self, entry_ids, delay):
+        # Üstel geri çekilme: delay * 2^attempts, en fazla 64 kat
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE pending SET attempts = attempts + 1, "
+                "next_attempt = ? + ? * (1 << MIN(attempts, 6)) WHERE entry_id = ?",
+                [(time.time(), delay, entry_id) for entry_id in entry_ids],
+            )
+
+    def get(self, entry_id, with_embedding=True):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT entry_id, text, metadata, vec_row, vec_collection FROM entries WHERE entry_id = ?",
+                (entry_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return self._row_to_entry(row, with_embedding)
+
+    def get_many(self, entry_ids, with_embedding=False):
+        entry_ids = list(entry_ids)
+        if not entry_ids:
+            return []
+        placeholders = ", ".join("?" for _ in entry_ids)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT entry_id, text, metadata, vec_row, vec_collection FROM entries WHERE entry_id IN ({placeholders})",
+                entry_ids,
+            ).fetchall()
+        by_id = {row[0]: self._row_to_entry(row, with_embedding) for row in rows}
+        return [by_id[entry_id] for entry_id in entry_ids if entry_id in by_id]
+
+    def vector_rows(self, after_seq=0):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT seq, entry_id, timestamp, vec_row FROM entries "
+                "WHERE seq > ? AND vec_collection = ? ORDER BY seq",
+                (after_seq, self.collection_id),
+            ).fetchall()
+
+    def changes(self, since_seq=0, limit=500, with_embedding=False):
+        # Her yazma yeni seq aldığından seq > imleç olan kayıtlar yeni ya da değişmiş kayıtlardır
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT seq, entry_id, text, metadata, vec_row, vec_collection FROM entries WHERE seq > ? ORDER BY seq LIMIT ?",
+                (int(since_seq), int(limit)),
+            ).fetchall()
+        return [(row[0], self._row_to_entry(row[1:], with_embedding)) for row in rows]
+
+    def last_seq(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM entries").fetchone()[0]
+
+    def __contains__(self, entry_id):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM entries WHERE entry_id = ?", (entry_id,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def range(self, start_ts=None, end_ts=None, with_embedding=True, limit=None):
+        query = "SELECT entry_id, text, metadata, vec_row, vec_collection FROM entries"
+        clauses, params = [], []
+        if start_ts is not None:
+            clauses.append("timestamp >= ?")
+            params.append(int(start_ts))
+        if end_ts is not None:
+            clauses.append("timestamp <= ?")
+            params.append(int(end_ts))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY timestamp, seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [self._row_to_entry(row, with_embedding) for row in rows]
+
+    def columns(self, start_ts=None, end_ts=None):
+        query = "SELECT timestamp, key_count, mouse_count, window_ids, duration, dwell FROM entries"
+        clauses, params = [], []
+        if start_ts is not None:
+            clauses.append("timestamp >= ?")
+            params.append(int(start_ts))
+        if end_ts is not None:
+            clauses.append("timestamp <= ?")
+            params.append(int(end_ts))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY timestamp, seq"
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        # Sütun düzeni: her kaydın pencere id'leri window_ids[offsets[i]:offsets[i + 1]]
+        n = len(rows)
+        chunks = [np.frombuffer(row[3] or b"", dtype=np.int32) for row in rows]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+        window_ids = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int32)
+        # Odak süreleri aynı düzende: dwell_ids[dwell_offsets[i]:dwell_offsets[i + 1]]
+        dwell_chunks = [np.frombuffer(row[5] or b"", dtype=np.int32).reshape(-1, 2) for row in rows]
+        dwell_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in dwell_chunks], out=dwell_offsets[1:])
+        dwell = np.concatenate(dwell_chunks) if dwell_chunks else np.empty((0, 2), dtype=np.int32)
+        return {
+            "timestamp": np.fromiter((row[0] for row in rows), dtype=np.int64, count=n),
+            "key_count": np.fromiter((row[1] or 0 for row in rows), dtype=np.int64, count=n),
+            "mouse_count": np.fromiter((row[2] or 0 for row in rows), dtype=np.int64, count=n),
+            # Süresi olmayan eski kayıtlar sabit 60 sn döngüden gelir
+            "duration": np.fromiter((row[4] or DEFAULT_DURATION for row in rows), dtype=np.int64, count=n),
+            "window_ids": window_ids,
+            "window_offsets": offsets,
+            "dwell_ids": dwell[:, 0],
+            "dwell_ms": dwell[:, 1],
+            "dwell_offsets": dwell_offsets,
+            "window_titles": self.window_titles(np.union1d(window_ids, dwell[:, 0])),
+        }
+
+    def fingerprint(self, start_ts=None, end_ts=None):
+        # Her yazma yeni bir seq üretir; aralıktaki seq kümesi değişmediyse veri de değişmemiştir
+        query = "SELECT COUNT(*), MAX(seq), SUM(seq) FROM entries"
+        clauses, params = [], []
+        if start_ts is not None:
+            clauses.append("timestamp >= ?")
+            params.append(int(start_ts))
+        if end_ts is not None:
+            clauses.append("timestamp <= ?")
+            params.append(int(end_ts))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self.lock:
+            count, max_seq, sum_seq = self.conn.execute(query, params).fetchone()
+        return hashlib.sha1(f"{count}:{max_seq}:{sum_seq}".encode("utf-8")).hexdigest()
+
+    def time_bounds(self):
+        with self.lock:
+            return self.conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM entries").fetchone()
+
+    def put_rollup(self, level, bucket_start, data):
+        encoded = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT data FROM rollups WHERE level = ? AND bucket_start = ?", (level, bucket_start)
+            ).fetchone()
+            if row is not None and row[0] == encoded:
+                return False
+            # Veri değiştiyse eski özet geçersiz
+            self.conn.execute(
+                "INSERT OR REPLACE INTO rollups (level, bucket_start, data, summary) VALUES (?, ?, ?, NULL)",
+                (level, bucket_start, encoded),
+            )
+            return True
+
+    def set_rollup_summary(self, level, bucket_start, summary):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE rollups SET summary = ? WHERE level = ? AND bucket_start = ?",
+                (summary, level, bucket_start),
+            )
+
+    def rollups(self, level, start_ts=None, end_ts=None):
+        query = "SELECT bucket_start, data, summary FROM rollups WHERE level = ?"
+        params = [level]
+        if start_ts is not None:
+            query += " AND bucket_start >= ?"
+            params.append(int(start_ts))
+        if end_ts is not None:
+            query += " AND bucket_start <= ?"
+            params.append(int(end_ts))
+        query += " ORDER BY bucket_start"
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [{"bucket_start": row[0], "data": json.loads(row[1]), "summary": row[2]} for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+BACKENDS = {
+    "sqlite": SQLiteStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def migrate_json(store, json_path=LEGACY_DB_PATH):
+    if not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+        return 0
+    with open(json_path, "r", encoding="utf-8") as f:
+        database = json.load(f)
+    count = store.put_many(database.items())
+    # Tekrar içe aktarılmasın diye eski dosyayı kenara al
+    os.replace(json_path, json_path + ".migrated")
+    print(f"Migrated {count} entries from {json_path}")
+    return count
+
+
+def get_store(backend=None):
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = backend or os.getenv("AHTABYTE_STORE", "sqlite")
+            _store = BACKENDS[backend]()
+            migrate_json(_store)
+        return _store
+
+
+if __name__ == "__main__":
+    store = get_store()
+    print(f"{len(store)} entries in {store.path}")
+    for collection in store.collections():
+        print(f"{'*' if collection['active'] else ' '} {collection['name']}: {collection['entries']} entries, dim {collection['dim']}")
@@ -1,26 +1,90 @@
-import threading
+import math
 import time
-from pynput import mouse, keyboard
+import numpy as np
+
+RING_SECONDS = 3600
+IDLE_GAP = 30  # bu kadar saniye olay yoksa aktif aralık biter
+BURST_GAP = 2
+BURST_MIN_SECONDS = 5
+BURST_MIN_RATE = 2  # saniyede tuş
+
+
+def spans(mask, max_gap, start_ts):
+    # mask[i]: start_ts + i saniyesinde olay var mı; aradaki boşluk max_gap'i aşmayan saniyeler birleştirilir
+    active = np.flatnonzero(mask)
+    if len(active) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(active) > max_gap)
+    starts = np.concatenate(([active[0]], active[breaks + 1]))
+    ends = np.concatenate((active[breaks], [active[-1]]))
+    return [(int(start_ts + s), int(start_ts + e + 1)) for s, e in zip(starts, ends)]
 
 
 class Inputs:
-    def __init__(self):
+    # Klavye ve mouse dinleyicileri ayrı thread'lerde çalışır; her thread sadece kendi sayaçlarına yazar,
+    # bu yüzden olay başına kilit gerekmez. Okuyucu (repeater) tek bir saniyelik kutuyu yarım görebilir.
+
+    def __init__(self, clock=time.time, ring_seconds=RING_SECONDS):
+        self.clock = clock
+        self.size = ring_seconds
+        # Klavye thread'i
         self.keysn = 0
+        self.key_secs = [-1] * ring_seconds
+        self.key_bins = [0] * ring_seconds
+        # Mouse thread'i
         self.clickn = 0
-        self.lock = threading.Lock()
+        self.scrolln = 0
+        self.move_px = 0.0
+        self.mouse_secs = [-1] * ring_seconds
+        self.click_bins = [0] * ring_seconds
+        self.scroll_bins = [0] * ring_seconds
+        self.move_bins = [0.0] * ring_seconds
+        self._last_pos = None
+        self._reset_at = (0, 0)
 
     def keyspress(self, key):
-        with self.lock:
-            self.keysn += 1
+        now = int(self.clock())
+        i = now % self.size
+        if self.key_secs[i] != now:
+            self.key_bins[i] = 0
+            self.key_secs[i] = now
+        self.key_bins[i] += 1
+        self.keysn += 1
+
+    def _mouse_slot(self):
+        now = int(self.clock())
+        i = now % self.size
+        if self.mouse_secs[i] != now:
+            self.click_bins[i] = 0
+            self.scroll_bins[i] = 0
+            self.move_bins[i] = 0.0
+            self.mouse_secs[i] = now
+        return i
 
     def clickpress(self, x, y, button, pressed):
         if pressed:
-            with self.lock:
-                self.clickn += 1
+            self.click_bins[self._mouse_slot()] += 1
+            self.clickn += 1
+
+    def scroll(self, x, y, dx, dy):
+        self.scroll_bins[self._mouse_slot()] += 1
+        self.scrolln += 1
+
+    def move(self, x, y):
+        last = self._last_pos
+        self._last_pos = (x, y)
+        if last is None:
+            return
+        distance = math.hypot(x - last[0], y - last[1])
+        self.move_bins[self._mouse_slot()] += distance
+        self.move_px += distance
 
     def startc(self):
+        # pynput ekransız ortamda import edilemez; kayıt ve snapshot dinleyici olmadan da çalışır
+        from pynput import mouse, keyboard
+
         self.klistener = keyboard.Listener(on_press=self.keyspress)
-        self.mlistener = mouse.Listener(on_click=self.clickpress)
+        self.mlistener = mouse.Listener(on_click=self.clickpress, on_scroll=self.scroll, on_move=self.move)
 
         self.klistener.start()
         self.mlistener.start()
@@ -28,9 +92,49 @@ class Inputs:
         self.klistener.join()
         self.mlistener.join()
 
+    def peek(self):
+        keys, clicks = self._reset_at
+        return self.keysn - keys + self.clickn - clicks
+
     def reset(self):
-        with self.lock:
-            stats = (self.keysn, self.clickn)
-            self.keysn = 0
-            self.clickn = 0
-            return stats
\ No newline at end of file
+        # Toplamlar hiç sıfırlanmaz; son reset'ten bu yana fark döner
+        keysn, clickn = self.keysn, self.clickn
+        keys, clicks = self._reset_at
+        self._reset_at = (keysn, clickn)
+        return keysn - keys, clickn - clicks
+
+    def _window(self, secs, bins, seconds_range, idx):
+        secs = np.asarray(secs)[idx]
+        values = np.asarray(bins)[idx]
+        return np.where(secs == seconds_range, values, 0)
+
+    def snapshot(self, seconds=60, now=None):
+        now = int(self.clock() if now is None else now)
+        seconds = max(1, min(int(seconds), self.size))
+        start = now - seconds + 1
+        seconds_range = np.arange(start, now + 1)
+        idx = seconds_range % self.size
+
+        keys = self._window(self.key_secs, self.key_bins, seconds_range, idx).astype(np.int32)
+        clicks = self._window(self.mouse_secs, self.click_bins, seconds_range, idx).astype(np.int32)
+        scroll = self._window(self.mouse_secs, self.scroll_bins, seconds_range, idx).astype(np.int32)
+        move = self._window(self.mouse_secs, self.move_bins, seconds_range, idx).astype(np.float32)
+
+        active = (keys > 0) | (clicks > 0) | (scroll > 0) | (move > 0)
+        bursts = []
+        for burst_start, burst_end in spans(keys > 0, BURST_GAP, start):
+            count = int(keys[burst_start - start:burst_end - start].sum())
+            duration = burst_end - burst_start
+            if duration >= BURST_MIN_SECONDS and count / duration >= BURST_MIN_RATE:
+                bursts.append((burst_start, burst_end, count))
+        return {
+            "start": start,
+            "end": now + 1,
+            "keys": keys,
+            "clicks": clicks,
+            "scroll": scroll,
+            "move": move,
+            "active_seconds": int(active.sum()),
+            "active_spans": spans(active, IDLE_GAP, start),
+            "typing_bursts": bursts,
+        }
@@ -0,0 +1,309 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import json
+import threading
+import numpy as np
+from src.core import config
+
+EMBEDDING_DTYPE = os.getenv("AHTABYTE_EMBEDDING_DTYPE", "float16")  # float32 | float16; sadece yeni matrislerde
+SCAN_DTYPE = os.getenv("AHTABYTE_EMBEDDING_SCAN", "int8")  # int8 | none
+RERANK_FACTOR = int(os.getenv("AHTABYTE_EMBEDDING_RERANK", "4"))  # 0 = yeniden sıralama yok
+RERANK_MIN = 50
+ANN_MIN_ROWS = int(os.getenv("AHTABYTE_ANN_MIN_ROWS", "20000"))  # aralıkta bundan az satır varsa tam tarama
+CHUNK_ROWS = 65536
+
+
+def quantize(vectors):
+    # Satır başına ölçekli int8: v ~= q * scale
+    scale = np.abs(vectors).max(axis=1) / 127
+    scale[scale == 0] = 1
+    q = np.clip(np.rint(vectors / scale[:, None]), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+
+def chunked_dot(matrix, rows, query, scale=None):
+    # Satırlar parça parça float32'ye çevrilir; tüm aralığın kopyası bellekte oluşmaz
+    scores = np.empty(len(rows), dtype=np.float32)
+    for i in range(0, len(rows), CHUNK_ROWS):
+        block = np.asarray(matrix[rows[i:i + CHUNK_ROWS]], dtype=np.float32)
+        scores[i:i + CHUNK_ROWS] = block @ query
+    if scale is not None:
+        scores *= scale[rows]
+    return scores
+
+
+class EmbeddingMatrix:
+
+    def __init__(self, path, dtype=EMBEDDING_DTYPE, scan=SCAN_DTYPE):
+        self.path = path
+        self.norms_path = path + ".norms"
+        self.meta_path = path + ".meta"
+        self.scan_path = path + ".q8"
+        self.scale_path = path + ".q8scale"
+        self.lock = threading.Lock()
+        self.dim = None
+        self.dtype = np.dtype(dtype)
+        self.scan = scan == "int8"
+        self._matrix = None
+        self._norms = None
+        self._scan = None
+        self._scale = None
+        self._mapped_rows = 0
+        self._scan_rows = 0
+        self._load_meta()
+
+    def _load_meta(self):
+        if self.dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            # Var olan matris kendi tipinde kalır
+            self.dtype = np.dtype(meta.get("dtype", "float32"))
+
+    def __len__(self):
+        self._load_meta()
+        if self.dim is None or not os.path.exists(self.norms_path):
+            return 0
+        # Norm dosyası en son yazılır, satır sayısının kaynağı odur
+        return os.path.getsize(self.norms_path) // 4
+
+    def append(self, embedding):
+        return self.append_many([embedding])[0]
+
+    def append_many(self, embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError("Embeddings must be a list of equal-length vectors")
+        with self.lock:
+            self._load_meta()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} != {self.dim}")
+
+            row = len(self)
+            stored = vectors.astype(self.dtype)
+            with open(self.path, "a+b") as f:
+                # Yarım kalmış bir önceki yazmayı at
+                f.truncate(row * self.dim * self.dtype.itemsize)
+                f.write(stored.tobytes())
+            if self.scan:
+                self._sync_scan(row)
+                q, scale = quantize(stored.astype(np.float32))
+                self._write_scan(row, q, scale)
+            with open(self.norms_path, "ab") as f:
+                f.write(np.linalg.norm(stored.astype(np.float32), axis=1).astype(np.float32).tobytes())
+            return list(range(row, row + len(vectors)))
+
+    def _write_scan(self, row, q, scale):
+        with open(self.scan_path, "a+b") as f:
+            f.truncate(row * self.dim)
+            f.write(q.tobytes())
+        with open(self.scale_path, "a+b") as f:
+            f.truncate(row * 4)
+            f.write(scale.tobytes())
+
+    def _sync_scan(self, n):
+        # int8 kopyası eksikse (eski matris, yarım yazma) float matristen tamamlanır
+        done = os.path.getsize(self.scale_path) // 4 if os.path.exists(self.scale_path) else 0
+        done = min(done, n)
+        if done == n:
+            return
+        matrix = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(n, self.dim))
+        for start in range(done, n, CHUNK_ROWS):
+            q, scale = quantize(np.asarray(matrix[start:start + CHUNK_ROWS], dtype=np.float32))
+            self._write_scan(start, q, scale)
+        del matrix
+
+    def arrays(self):
+        n = len(self)
+        if n == 0:
+            return np.empty((0, self.dim or 0), dtype=self.dtype), np.empty(0, dtype=np.float32)
+        if n != self._mapped_rows:
+            self._matrix = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(n, self.dim))
+            self._norms = np.memmap(self.norms_path, dtype=np.float32, mode="r", shape=(n,))
+            self._mapped_rows = n
+        return self._matrix, self._norms
+
+    def scan_arrays(self):
+        # Aramanın ilk geçişi için int8 matris ve satır ölçekleri; kapalıysa None
+        if not self.scan:
+            return None
+        n = len(self)
+        if n == 0:
+            return None
+        if n != self._scan_rows:
+            with self.lock:
+                self._sync_scan(n)
+            self._scan = np.memmap(self.scan_path, dtype=np.int8, mode="r", shape=(n, self.dim))
+            self._scale = np.memmap(self.scale_path, dtype=np.float32, mode="r", shape=(n,))
+            self._scan_rows = n
+        return self._scan, self._scale
+
+    def get(self, row):
+        matrix, _ = self.arrays()
+        if row is None or row >= len(matrix):
+            return None
+        return matrix[row].astype(np.float32).tolist()
+
+    def nbytes(self):
+        paths = [self.path, self.norms_path, self.scan_path, self.scale_path]
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def rewrite(path, dim=None, dtype=EMBEDDING_DTYPE):
+    # text-embedding-3 vektörleri kısaltılabilir: ilk dim boyut alınıp yeniden normalize edilir.
+    # Satır numaraları değişmez, kayıtlardaki vec_row geçerli kalır.
+    source = EmbeddingMatrix(path)
+    matrix, _ = source.arrays()
+    n = len(matrix)
+    dim = dim or source.dim
+    tmp_path = path + ".rewrite"
+    suffixes = ("", ".norms", ".q8", ".q8scale", ".meta")
+    # Yarıda kalmış önceki bir dönüşümün satırları yeni satırların önüne eklenmesin
+    for suffix in suffixes:
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+    target = EmbeddingMatrix(tmp_path, dtype=dtype)
+    for start in range(0, n, CHUNK_ROWS):
+        block = np.asarray(matrix[start:start + CHUNK_ROWS, :dim], dtype=np.float32)
+        lengths = np.linalg.norm(block, axis=1)
+        target.append_many(block / np.where(lengths > 0, lengths, 1)[:, None])
+    del matrix
+    for suffix in suffixes:
+        if os.path.exists(tmp_path + suffix):
+            os.replace(tmp_path + suffix, path + suffix)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    # IVF merkezleri eski uzaya ait
+    if os.path.exists(path + ".ivf.npz"):
+        os.remove(path + ".ivf.npz")
+    return n
+
+
+class VectorIndex:
+
+    def __init__(self, store, ann=None, rerank_factor=RERANK_FACTOR, ann_min_rows=ANN_MIN_ROWS):
+        self.store = store
+        self.ann = ann
+        self.rerank_factor = rerank_factor
+        self.ann_min_rows = ann_min_rows
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.int64)
+        self.entry_ids = np.empty(0, dtype=object)
+        self._id_set = set()
+        self.last_seq = 0
+
+    def refresh(self):
+        with self.lock:
+            new_rows = self.store.vector_rows(after_seq=self.last_seq)
+            if not new_rows:
+                return
+            if self.ann is not None:
+                self.ann.sync(*self.store.vectors.arrays())
+            # Üzerine yazılan kayıt varsa eski satırı ayıklamak yerine baştan yükle
+            if any(entry_id in self._id_set for _, entry_id, _, _ in new_rows):
+                self._reset()
+                new_rows = self.store.vector_rows(after_seq=0)
+
+            seqs, ids, timestamps, rows = zip(*new_rows)
+            self.timestamps = np.concatenate([self.timestamps, np.asarray(timestamps, dtype=np.int64)])
+            self.rows = np.concatenate([self.rows, np.asarray(rows, dtype=np.int64)])
+            self.entry_ids = np.concatenate([self.entry_ids, np.asarray(ids, dtype=object)])
+            self._id_set.update(ids)
+            self.last_seq = max(seqs)
+
+            if np.any(np.diff(self.timestamps) < 0):
+                order = np.argsort(self.timestamps, kind="stable")
+                self.timestamps = self.timestamps[order]
+                self.rows = self.rows[order]
+                self.entry_ids = self.entry_ids[order]
+
+    def _snapshot(self):
+        # refresh() dizileri yerinde değiştirmez, yenileriyle değiştirir; kilit altında alınan referanslar tutarlıdır
+        with self.lock:
+            return self.timestamps, self.rows, self.entry_ids
+
+    @staticmethod
+    def _bounds(timestamps, start_ts, end_ts):
+        lo = 0 if start_ts is None else int(np.searchsorted(timestamps, start_ts, side="left"))
+        hi = len(timestamps) if end_ts is None else int(np.searchsorted(timestamps, end_ts, side="right"))
+        return lo, hi
+
+    def count(self, start_ts=None, end_ts=None):
+        self.refresh()
+        timestamps, _, _ = self._snapshot()
+        lo, hi = self._bounds(timestamps, start_ts, end_ts)
+        return max(0, hi - lo)
+
+    def search(self, query_embedding, start_ts=None, end_ts=None, n_results=10, exact=False):
+        self.refresh()
+        timestamps, all_rows, entry_ids = self._snapshot()
+        lo, hi = self._bounds(timestamps, start_ts, end_ts)
+        if hi <= lo or n_results <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query_norm = float(np.linalg.norm(query))
+        if query_norm == 0:
+            return []
+
+        matrix, norms = self.store.vectors.arrays()
+        positions = np.arange(lo, hi)
+        rows = all_rows[lo:hi]
+        # Zaman aralığı önce daraltılır, ANN sadece bu aralıktaki satırları eler
+        # Dar aralıklarda tam tarama zaten ucuz (int8, ~1 ms); IVF orada recall kaybettirir
+        if self.ann is not None and not exact and hi - lo >= self.ann_min_rows:
+            selected = self.ann.candidates(query, rows)
+            # Dar aralıklarda aday sayısı k'nın altına düşerse tam taramaya dön
+            if selected is not None and len(selected) >= n_results:
+                positions = positions[selected]
+                rows = rows[selected]
+
+        quantized = None if exact else self.store.vectors.scan_arrays()
+        if quantized is not None:
+            # İlk geçiş int8 kopya üzerinde; en iyi adaylar float matrisle yeniden puanlanır
+            scan, scale = quantized
+            scores = self._cosine(chunked_dot(scan, rows, query, scale), norms[rows], query_norm)
+            if self.rerank_factor:
+                k = min(max(n_results * self.rerank_factor, RERANK_MIN), len(scores))
+                top = np.argpartition(-scores, k - 1)[:k]
+                positions, rows = positions[top], rows[top]
+                scores = self._cosine(chunked_dot(matrix, rows, query), norms[rows], query_norm)
+        else:
+            scores = self._cosine(chunked_dot(matrix, rows, query), norms[rows], query_norm)
+
+        k = min(n_results, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(entry_ids[positions[i]], float(scores[i])) for i in top]
+
+    @staticmethod
+    def _cosine(dots, norms, query_norm):
+        denom = np.asarray(norms, dtype=np.float32) * query_norm
+        return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rewrite the embedding matrix with fewer dimensions / a smaller dtype")
+    parser.add_argument("--dim", type=int, default=None, help="keep the first N dimensions (text-embedding-3 only)")
+    parser.add_argument("--dtype", default=EMBEDDING_DTYPE, choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    from src.core.store import get_store
+
+    # Son kullanılan koleksiyonun matrisi
+    path = get_store().vectors.path
+    before = EmbeddingMatrix(path).nbytes()
+    rows = rewrite(path, args.dim, args.dtype)
+    after = EmbeddingMatrix(path).nbytes()
+    print(f"{rows} vectors rewritten: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
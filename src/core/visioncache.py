@@ -0,0 +1,85 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+
+
+def dhash(img, hash_size=8):
+    from PIL import Image
+
+    # Fark hash'i: yan yana piksellerin parlaklık karşılaştırması, 64 bit
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class AnalysisCache:
+
+    def __init__(self, path=None, max_size=512, max_distance=4):
+        self.path = path
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for key, analysis in json.load(f):
+                    self.entries[int(key, 16)] = analysis
+        except (ValueError, OSError) as e:
+            print(f"Vision cache ignored: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([[f"{key:016x}", analysis] for key, analysis in self.entries.items()], f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, image_hash):
+        with self.lock:
+            best_key, best_distance = None, self.max_distance + 1
+            # En yeni kayıtlar sonda; benzer kare büyük ihtimalle oradadır
+            for key in reversed(self.entries):
+                distance = (key ^ image_hash).bit_count()
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(best_key)
+            return self.entries[best_key]
+
+    def put(self, image_hash, analysis):
+        with self.lock:
+            self.entries[image_hash] = analysis
+            self.entries.move_to_end(image_hash)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            self._save()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -1,11 +1,146 @@
-import pygetwindow as gw
+import threading
+import time
+
+IGNORED_TITLES = ["Program Manager", "Ayarlar", "OmApSvcBroker"]
+POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = 2.0
+MAX_POLL_CPU = 0.01  # yoklamanın harcayabileceği en fazla süre oranı
+
 
 def getwindows():
+    # pygetwindow sadece Windows/macOS'ta import edilebilir
+    import pygetwindow as gw
+
     windows = gw.getAllWindows()
     clearwindows = []
-        
+
     for w in windows:
         if w.title and w.visible and w.width > 0 and w.height > 0:
-            if w.title not in ["Program Manager", "Ayarlar", "OmApSvcBroker"]: 
+            if w.title not in IGNORED_TITLES:
                 clearwindows.append(w.title)
-    return clearwindows
\ No newline at end of file
+    return clearwindows
+
+
+def app_name(title):
+    # "Belge.docx - Word" -> "Word"; ayraç yoksa başlığın kendisi
+    for separator in (" - ", " — ", " | "):
+        if separator in title:
+            return title.rsplit(separator, 1)[1].strip()
+    return title
+
+
+class ActiveWindowProvider:
+
+    def __call__(self):
+        import pygetwindow as gw
+
+        window = gw.getActiveWindow()
+        if window is None or not window.title or window.title in IGNORED_TITLES:
+            return None
+        return window.title
+
+
+class FakeWindowProvider:
+    # Ekransız ortam için: (saniye, başlık) senaryosunu saate göre döngüsel oynatır
+    def __init__(self, script, clock=time.monotonic):
+        self.script = script
+        self.clock = clock
+        self.period = sum(seconds for seconds, _ in script)
+        self.start = clock()
+
+    def __call__(self):
+        offset = (self.clock() - self.start) % self.period
+        for seconds, title in self.script:
+            if offset < seconds:
+                return title
+            offset -= seconds
+        return None
+
+
+class FocusTracker:
+
+    def __init__(self, provider=None, interval=POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL,
+                 max_cpu=MAX_POLL_CPU, clock=time.monotonic):
+        self.provider = provider or ActiveWindowProvider()
+        self.base_interval = interval
+        self.interval = interval
+        self.max_interval = max_interval
+        self.max_cpu = max_cpu
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.dwell = {}
+        self.apps = {}
+        self.current = None
+        self.last_poll = None
+        self.polls = 0
+        self.poll_time = 0.0
+        self._stop = threading.Event()
+
+    def _credit(self, now):
+        if self.last_poll is not None and self.current is not None:
+            # Uyku/askıya alma sonrası büyük boşluk odak süresi sayılmaz
+            elapsed = min(now - self.last_poll, 3 * self.max_interval)
+            self.dwell[self.current] = self.dwell.get(self.current, 0.0) + elapsed
+            app = app_name(self.current)
+            self.apps[app] = self.apps.get(app, 0.0) + elapsed
+        self.last_poll = now
+
+    def poll(self):
+        started = time.perf_counter()
+        try:
+            title = self.provider()
+        except Exception as e:
+            print(f"Active window poll failed: {e}")
+            title = None
+        cost = time.perf_counter() - started
+
+        with self.lock:
+            self._credit(self.clock())
+            self.current = title
+        self.polls += 1
+        self.poll_time += cost
+        # Yoklama pahalıysa aralığı büyüterek CPU payını max_cpu altında tut
+        self.interval = min(self.max_interval, max(self.base_interval, cost / self.max_cpu))
+        return title
+
+    def flush(self):
+        # Son flush'tan bu yana başlık başına odak saniyeleri; son yoklamadan bu yana geçen süre de sayılır
+        with self.lock:
+            self._credit(self.clock())
+            dwell, self.dwell = self.dwell, {}
+        return {title: round(seconds, 1) for title, seconds in dwell.items()}
+
+    def app_dwell(self):
+        # Oturum boyunca uygulama başına toplam odak saniyeleri
+        with self.lock:
+            return dict(self.apps)
+
+    def stats(self):
+        return {
+            "polls": self.polls,
+            "interval": self.interval,
+            "avg_poll_ms": self.poll_time / self.polls * 1000 if self.polls else 0.0,
+        }
+
+    def run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # --fake: ekransız Linux'ta örnek senaryo ile çalıştır
+    provider = None
+    if "--fake" in sys.argv:
+        provider = FakeWindowProvider([(3, "main.py - Visual Studio Code"), (2, "Docs - Google Chrome"), (1, "Slack")])
+    tracker = FocusTracker(provider)
+    threading.Thread(target=tracker.run, daemon=True).start()
+    for _ in range(3):
+        time.sleep(5)
+        print(tracker.flush(), tracker.stats())
+    print(tracker.app_dwell())
@@ -5,16 +5,23 @@ import threading
 import time
 from datetime import datetime
 
+from src.core import config
 from src.core.tickcollect import Inputs
-from src.core.wincollect import getwindows
-from src.core.visscollect import capturescreen
+from src.core.wincollect import getwindows, FocusTracker
+from src.core.visscollect import ScreenCapture
 from src.ui.trigger import Effect
-from src.core.rag import RAGPipeline
+from src.core.store import get_store, entry_id
+from src.core.ingestqueue import IngestWorker
+from src.core.scheduler import SamplingScheduler
+from src.core.screenshots import get_screenshots
+from src.core import metrics
 
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import QObject, pyqtSignal
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+COMPACT_INTERVAL = 6 * 3600
+POLL_INTERVAL = 5
 
 
 class Signaler(QObject):
@@ -26,53 +33,120 @@ class Repeater:
         self.ticks = Inputs()
         self.context_file = os.path.join(BASE_DIR, "data", "chromacontext.md")
         os.makedirs(os.path.join(BASE_DIR, "data"), exist_ok=True)
-        self.pipeline = RAGPipeline()
-        self.capture_every_n = 3  # 0 yaparsan ekran analizi tamamen kapanır
-        self._tick_index = 0
+        # Örnekleme sadece yerel kuyruğa yazar; RAG yığını worker thread'inde yüklenir (bkz. run_worker)
+        self.store = get_store()
+        self.pipeline = None
+        self.worker = None
+        self.capture = ScreenCapture()
+        # Örnekleme aralığı aktiviteye göre değişir; AHTABYTE_VISION_BUDGET=0 ekran analizini tamamen kapatır
+        self.scheduler = SamplingScheduler()
+        self.focus = FocusTracker()
 
     def show_effect(self):
         self.effect = Effect()
         self.effect.show()
 
-    def stream_to_context(self, signaler):
-        interval = 60
-        next_time = time.time()
+    def sample(self, signaler):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with metrics.timer("getwindows"):
+            active_windows = getwindows()
+        key_count, mouse_count = self.ticks.reset()
+        decision = self.scheduler.tick(key_count, mouse_count, active_windows, self.focus.current)
+        with metrics.timer("inputs"):
+            inputs = self.ticks.snapshot(decision["elapsed"])
+            dwell = self.focus.flush()
+        focused = sorted(dwell.items(), key=lambda item: item[1], reverse=True)[:5]
+
+        img_path = None
+        if decision["capture"]:
+            with metrics.timer("capture"):
+                frame = self.capture.capture()
+            metrics.inc("ahtabyte_captures_total", skipped=str(frame is None).lower())
+            if frame is None:
+                print(f"[{now}] Screen unchanged, capture skipped.")
+            else:
+                img_path = frame["path"]
+                if self.worker is not None:
+                    self.worker.add_frame(frame)
+                self.scheduler.record_capture()
+
+        signaler.show_effect_signal.emit()
+
+        text = (
+            f"TIME: {now}\n"
+            f"ACTIVE_WINDOWS: {active_windows}\n"
+            f"FOCUSED_WINDOWS: {', '.join(f'{title} ({seconds:.0f}s)' for title, seconds in focused)}\n"
+            f"KEY_COUNT: {key_count}\n"
+            f"MOUSE_COUNT: {mouse_count}\n"
+            f"SCROLL_COUNT: {int(inputs['scroll'].sum())}\n"
+            f"MOUSE_DISTANCE: {int(inputs['move'].sum())}\n"
+            f"ACTIVE_SECONDS: {inputs['active_seconds']}\n"
+            f"TYPING_BURSTS: {len(inputs['typing_bursts'])}"
+        )
+        # Analiz ve embedding arka planda IngestWorker tarafından yapılır
+        fields = {
+            "key_count": key_count,
+            "mouse_count": mouse_count,
+            "windows": active_windows,
+            "duration": decision["elapsed"],
+            "dwell": dwell,
+        }
+        with metrics.timer("enqueue"):
+            self.store.enqueue(entry_id(now), now, text, img_path or "", fields)
+
+        with metrics.timer("context_append"):
+            with open(self.context_file, "a", encoding="utf-8") as f:
+                f.write(f"\n---\nENTRY_START: {now}\nSCREENSHOT_REF: {img_path or ''}\nENTRY_END\n---\n")
+        metrics.inc("ahtabyte_ticks_total", state=decision["state"])
+
+        print(f"[{now}] Queued ({decision['state']}, next in {decision['interval']}s, capture: {decision['reason']}).")
 
+    def stream_to_context(self, signaler):
         while True:
+            # Planlanan tick zamanından sapma (bekleme döngüsü ve önceki tick'in süresi)
+            metrics.observe("ahtabyte_tick_drift_seconds", max(0.0, time.time() - self.scheduler.next_time))
             try:
-                now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                active_windows = getwindows()
-                key_count, mouse_count = self.ticks.reset()
-                self._tick_index += 1
-
-                img_path = None
-                if self.capture_every_n and self._tick_index % self.capture_every_n == 0:
-                    img_path = capturescreen()
+                with metrics.timer("tick"):
+                    self.sample(signaler)
+            except Exception as e:
+                import traceback
+                print(f"ERROR: {e}")
+                traceback.print_exc()
 
-                signaler.show_effect_signal.emit()
+            self.wait_next_tick()
 
-                text = (
-                    f"TIME: {now}\n"
-                    f"ACTIVE_WINDOWS: {active_windows}\n"
-                    f"KEY_COUNT: {key_count}\n"
-                    f"MOUSE_COUNT: {mouse_count}"
-                )
-                self.pipeline.ingest(text, now, img_path=img_path)
+    def wait_next_tick(self):
+        # Beklerken pencereler ve giriş ucuzca yoklanır; odak değişirse tick öne çekilir
+        while True:
+            remaining = self.scheduler.next_time - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, POLL_INTERVAL))
+            try:
+                if self.scheduler.poll(getwindows(), self.ticks.peek(), self.focus.current):
+                    return
+            except Exception as e:
+                print(f"Window poll failed: {e}")
 
-                with open(self.context_file, "a", encoding="utf-8") as f:
-                    f.write(f"\n---\nENTRY_START: {now}\nSCREENSHOT_REF: {img_path or ''}\nENTRY_END\n---\n")
+    def run_worker(self):
+        # OpenAI istemcisi ve embedding modeli ilk örneği geciktirmesin; kuyruktaki işler yüklenince işlenir
+        from src.core.rag import RAGPipeline
 
-                print(f"[{now}] Saved.")
+        self.pipeline = RAGPipeline()
+        self.pipeline.warm_up()
+        self.worker = IngestWorker(self.pipeline)
+        self.worker.run()
 
+    def compact_screenshots(self):
+        # Eski ekran görüntüleri günlük segmentlere taşınır, küçültülür ya da silinir
+        while True:
+            try:
+                stats = get_screenshots().compact()
+                if any(stats.values()):
+                    print(f"Screenshots compacted: {stats}")
             except Exception as e:
-                import traceback
-                print(f"ERROR: {e}")
-                traceback.print_exc()
-
-            next_time += interval
-            sleep_time = next_time - time.time()
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+                print(f"Screenshot compaction failed: {e}")
+            time.sleep(COMPACT_INTERVAL)
 
     def start(self):
         app = QApplication(sys.argv)
@@ -83,9 +157,21 @@ class Repeater:
         listener_thread = threading.Thread(target=self.ticks.startc, daemon=True)
         listener_thread.start()
 
+        focus_thread = threading.Thread(target=self.focus.run, daemon=True)
+        focus_thread.start()
+
+        worker_thread = threading.Thread(target=self.run_worker, daemon=True)
+        worker_thread.start()
+
+        compact_thread = threading.Thread(target=self.compact_screenshots, daemon=True)
+        compact_thread.start()
+
         stream_thread = threading.Thread(target=self.stream_to_context, args=(signaler,), daemon=True)
         stream_thread.start()
 
+        # Aşama süreleri data/metrics altına yazılır; sunucunun /metrics ucu bunları da gösterir
+        metrics.start_flusher("repeater")
+
         sys.exit(app.exec())
 
 